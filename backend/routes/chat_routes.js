@@ -15,6 +15,12 @@ const EMERGENCY_SYMPTOMS = [
   'heart attack', 'difficulty breathing', 'cannot breathe'
 ];
 
+// Canonical emergency tokens, as the ML service's /normalize returns them (mirrors triage.EMERGENCY_SYMPTOMS)
+const CANONICAL_EMERGENCY_SYMPTOMS = new Set([
+  'chest pain', 'breathlessness', 'blood in sputum', 'altered sensorium', 'coma', 'heart attack', 'cardiac arrest',
+  'paralysis', 'stroke', 'seizure', 'unconsciousness', 'severe bleeding'
+]);
+
 // Start a new chat session
 router.post('/start', authenticateToken, async (req, res) => {
   const { raw_symptoms } = req.body;
@@ -25,6 +31,16 @@ router.post('/start', authenticateToken, async (req, res) => {
       return res.status(400).json({ error: 'Please provide initial symptoms' });
     }
 
+    // Parse initial symptoms into canonical symptom tokens and check for emergency. The local word check
+    // stays as a safety net for phrasings the ML service does not recognise, and runs before any 400.
+    const localTokens = parseSymptoms(raw_symptoms);
+    const normalized = await normalizeSymptoms({ text: raw_symptoms });
+    const isEmergency = normalized.emergency || checkEmergency(localTokens);
+    const symptomTokens = normalized.symptoms.length === 0 && isEmergency ? localTokens : normalized.symptoms;
+    if (symptomTokens.length === 0) {
+      return res.status(400).json({ error: 'Could not recognise any symptoms, please describe them differently' });
+    }
+
     // Create new session
     const sessionResult = await pool.query(
       `INSERT INTO chat_sessions (session_id, user_id, status) 
@@ -35,16 +51,11 @@ router.post('/start', authenticateToken, async (req, res) => {
 
     const session = sessionResult.rows[0];
 
-    // Parse initial symptoms
-    const symptomTokens = parseSymptoms(raw_symptoms);
     const collected_symptoms = {};
     symptomTokens.forEach(token => {
       collected_symptoms[token] = 2; // Default severity
     });
 
-    // Check for emergency
-    const isEmergency = checkEmergency(Object.keys(collected_symptoms));
-
     if (isEmergency) {
       // Immediately triage as emergency
       await pool.query(
@@ -197,8 +208,9 @@ router.post('/continue', authenticateToken, async (req, res) => {
     // that is not present in collected_symptoms is treated as denied.
     const denied_symptoms = questions_asked.filter(token => !collected_symptoms[token]);
 
-    // Check for emergency after update
-    const isEmergency = checkEmergency(Object.keys(collected_symptoms));
+    // Check for emergency after update; the keys are already canonical tokens, so no ML round trip is needed
+    const symptomKeys = Object.keys(collected_symptoms);
+    const isEmergency = symptomKeys.some(isCanonicalEmergency) || checkEmergency(symptomKeys);
 
     if (isEmergency) {
       await pool.query(
@@ -342,6 +354,23 @@ function parseSymptoms(rawText) {
   return [...new Set(tokens)];
 }
 
+// Canonical symptom tokens and emergency flag from the ML service's phrase matcher;
+// falls back to local parsing and substring matching if the service is unreachable.
+async function normalizeSymptoms(input) {
+  try {
+    const response = await axios.post(`${FLASK_API_URL}/normalize`, input, { timeout: 2000 });
+    return response.data;
+  } catch (error) {
+    console.warn('ML normalize unavailable, parsing locally:', error.message);
+    const symptoms = input.text !== undefined ? parseSymptoms(input.text) : input.symptoms;
+    return { symptoms, emergency: checkEmergency(symptoms) };
+  }
+}
+
+function isCanonicalEmergency(symptom) {
+  return CANONICAL_EMERGENCY_SYMPTOMS.has(symptom.toLowerCase().replace(/_/g, ' '));
+}
+
 function checkEmergency(symptoms) {
   return symptoms.some(symptom =>
     EMERGENCY_SYMPTOMS.some(emergency =>
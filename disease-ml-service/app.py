@@ -1,164 +1,353 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS 
-import torch
-import joblib
-import re
 import os
+import struct
+import threading
 import json
-import torch.nn.functional as F
-from model import SymptomClassifier 
+import math
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from batching import MicroBatcher, QueueFullError
+from cache import LRUCache
+from metrics import SamplingProfiler
+from artifact_store import ArtifactWatcher, resolve_artifacts_dir
+from triage import (METRICS, apply_answer, build_bundle, canonicalize_state, parse_state, predict_states, prime_session_state,
+                    result_cache_key, state_error, valid_answer)
+import binary_protocol
 
 app = Flask(__name__)
 CORS(app) 
 
 # --- Global Artifacts and Configuration ---
-MODEL, VECTORIZER, ENCODER, DISEASE_SYMPTOM_MAP = None, None, None, None
-DEVICE = torch.device("cpu") 
-TEMPERATURE = 2.0
-
-# --- Medical History Data ---
-CHRONIC_DISEASES = {
-    "Hypertension": ["headache", "chest_pain", "dizziness", "loss_of_balance", "lack_of_concentration"],
-    "Migraine": ["acidity", "indigestion", "headache", "blurred_and_distorted_vision", "excessive_hunger", "stiff_neck", "depression", "irritability", "visual_disturbances"],
-    "Cervical spondylosis": ["back_pain", "weakness_in_limbs", "neck_pain", "dizziness", "loss_of_balance"],
-    "Diabetes": ["fatigue", "weight_loss", "restlessness", "lethargy", "irregular_sugar_level", "blurred_and_distorted_vision", "obesity", "excessive_hunger", "increased_appetite", "polyuria"],
-    "Arthritis": ["muscle_weakness", "stiff_neck", "swelling_joints", "movement_stiffness", "spinning_movements", "loss_of_balance", "unsteadiness", "weakness_of_one_body_side"],
-    "Chronic cholestasis": ["itching", "vomiting", "yellowish_skin", "nausea", "loss_of_appetite", "abdominal_pain", "yellowing_of_eyes"],
-    "Heart attack": ["vomiting", "breathlessness", "sweating", "chest_pain"],
-    "Bronchial Asthma": ["fatigue", "cough", "high_fever", "breathlessness", "family_history", "mucoid_sputum"],
-    "GERD": ["stomach_pain", "acidity", "ulcers_on_tongue", "vomiting", "cough", "chest_pain"],
-    "Peptic ulcer diseae": ["vomiting", "loss_of_appetite", "abdominal_pain", "passage_of_gases", "internal_itching"],
-    "Osteoarthristis": ["joint_pain", "neck_pain", "knee_pain", "hip_joint_pain", "swelling_joints", "painful_walking"],
-    "Hypothyroidism": ["fatigue", "weight_gain", "cold_hands_and_feets", "mood_swings", "lethargy", "dizziness", "puffy_face_and_eyes", "enlarged_thyroid", "brittle_nails", "swollen_extremeties", "depression", "irritability", "abnormal_menstruation"],
-    "Hyperthyroidism": ["fatigue", "mood_swings", "weight_loss", "restlessness", "sweating", "diarrhoea", "fast_heart_rate", "excessive_hunger", "muscle_weakness", "irritability", "abnormal_menstruation"],
-    "Hypoglycemia": ["vomiting", "fatigue", "anxiety", "sweating", "headache", "nausea", "blurred_and_distorted_vision", "excessive_hunger", "drying_and_tingling_lips", "slurred_speech", "irritability", "palpitations"],
-    "Psoriasis": ["skin_rash", "joint_pain", "skin_peeling", "silver_like_dusting", "small_dents_in_nails", "inflammatory_nails"],
-    "Varicose veins": ["fatigue", "cramps", "bruising", "obesity", "swollen_legs", "swollen_blood_vessels", "prominent_veins_on_calf"],
-    "Paralysis (brain hemorrhage)": ["vomiting", "headache", "weakness_of_one_body_side", "altered_sensorium"]
-}
-GENETIC_DISEASES = {
-    "Hemochromatosis": ["joint_pain", "vomiting", "fatigue", "high_fever", "loss_of_appetite", "abdominal_pain", "yellowing_of_eyes"],
-    "Thalassemia": ["fatigue", "weight_loss", "breathlessness", "yellowish_skin", "dark_urine", "loss_of_appetite", "abdominal_pain", "yellowing_of_eyes", "enlarged_spleen"],
-    "Sickle cell anemia": ["joint_pain", "vomiting", "fatigue", "high_fever", "breathlessness", "swelling_joints", "pain_in_bones", "chest_pain", "swelling_extremeties"],
-    "Cystic fibrosis": ["fatigue", "cough", "high_fever", "breathlessness", "mucoid_sputum", "rusty_sputum", "salty_taste_in_mouth", "weight_loss", "family_history"],
-}
-SEVERITY_LEVELS = {
-    'chest_pain': 5, 'breathlessness': 5, 'heart_attack': 5, 'paralysis_(brain_hemorrhage)': 5, 'coma': 5, 'blood_in_sputum': 5, 'acute_liver_failure': 5, 'altered_sensorium': 5,
-    'fast_heart_rate': 4, 'high_fever': 3, 'loss_of_balance': 3, 'unsteadiness': 3, 'weakness_of_one_body_side': 3, 'pain_behind_the_eyes': 3, 'dehydration': 3, 'vomiting': 3, 'chills': 3, 'joint_pain': 3, 'abdominal_pain': 3, 'diarrhoea': 3, 'yellowish_skin': 3, 'dark_urine': 3, 'swelling_joints': 3, 'painful_walking': 3, 'dizziness': 3, 'stiff_neck': 3, 'blurred_and_distorted_vision': 3, 'constipation': 3, 'sweating': 3,
-    'fatigue': 2, 'headache': 2, 'nausea': 2, 'cough': 2, 'skin_rash': 2, 'muscle_pain': 2, 'lethargy': 2, 'weight_loss': 2, 'loss_of_appetite': 2, 'restlessness': 2, 'mood_swings': 2,
-    'itching': 1, 'continuous_sneezing': 1, 'runny_nose': 1, 'acidity': 1, 'indigestion': 1
-}
-
-# --- Logic Functions ---
-def clean_symptoms(symptom_string):
-    if not isinstance(symptom_string, str): return ""
-    symptom_string = symptom_string.lower().replace('_', ' ').replace('-', ' ')
-    return " ".join([s.strip() for s in re.split(r'[,\s]+', symptom_string) if s.strip()])
-
-def analyze_medical_history(collected_symptoms_set, user_history_list):
-    history_matches = {}
-    all_history_symptoms = {**CHRONIC_DISEASES, **GENETIC_DISEASES}
-    for condition_name in user_history_list:
-        condition_symptoms = all_history_symptoms.get(condition_name)
-        if not condition_symptoms: continue
-        condition_symptoms_set = set(s.replace('_', ' ') for s in condition_symptoms)
-        matching_symptoms = collected_symptoms_set.intersection(condition_symptoms_set)
-        if len(condition_symptoms_set) > 0:
-            match_percentage = len(matching_symptoms) / len(condition_symptoms_set)
-            if len(matching_symptoms) >= 2 and match_percentage >= 0.4:
-                history_matches[condition_name] = match_percentage
-    return history_matches
-
-def get_next_question(probabilities, collected_symptoms, denied_symptoms):
-    k_diseases = min(2, len(ENCODER.classes_))
-    _, top_indices = torch.topk(probabilities, k=k_diseases)
-    top_diseases = ENCODER.inverse_transform(top_indices.flatten().tolist())
-    if len(top_diseases) < 2: return None
-    disease1, disease2 = top_diseases[0], top_diseases[1]
-    symptoms1, symptoms2 = set(DISEASE_SYMPTOM_MAP.get(disease1, [])), set(DISEASE_SYMPTOM_MAP.get(disease2, []))
-    all_asked = set(collected_symptoms.keys()) | set(denied_symptoms)
-    unasked = [s for s in list(symptoms1.symmetric_difference(symptoms2)) if s not in all_asked]
-    if unasked: return sorted(unasked, key=lambda s: SEVERITY_LEVELS.get(s, 0), reverse=True)[0]
-    unasked_fallback = [s for s in symptoms1 if s not in all_asked]
-    if unasked_fallback: return sorted(unasked_fallback, key=lambda s: SEVERITY_LEVELS.get(s, 0), reverse=True)[0]
-    return None
-
-def load_artifacts():
-    global MODEL, VECTORIZER, ENCODER, DISEASE_SYMPTOM_MAP
+BUNDLE = None # the ServingBundle being served; replaced as a whole, never mutated
+ARTIFACTS_ROOT = os.environ.get('ML_ARTIFACTS_DIR', 'artifacts') # flat, or versioned via artifact_store.py
+RELOAD_WATCH_S = float(os.environ.get('ML_RELOAD_WATCH_S', '0')) # >0 polls ARTIFACTS_ROOT and hot-reloads on change
+ADMIN_TOKEN = os.environ.get('ML_ADMIN_TOKEN') # required in X-Admin-Token for /admin/*; without it only localhost may call them
+MAX_BATCH_STATES = 512
+
+# --- Micro-batching (coalesces concurrent /predict calls into one forward pass) ---
+MICROBATCH_ENABLED = os.environ.get('ML_MICROBATCH', '0') == '1'
+MICROBATCH_MAX_SIZE = int(os.environ.get('ML_MICROBATCH_MAX_SIZE', '32'))
+MICROBATCH_WAIT_MS = float(os.environ.get('ML_MICROBATCH_WAIT_MS', '2'))
+MICROBATCH_MAX_QUEUE = int(os.environ.get('ML_MICROBATCH_MAX_QUEUE', '1024'))
+MICROBATCH_TIMEOUT_S = 5.0
+
+# --- Stateful sessions (optional: clients that send a session_id may send only the latest answer) ---
+SESSION_CACHE = LRUCache(int(os.environ.get('ML_SESSION_CACHE_SIZE', '10000')), float(os.environ.get('ML_SESSION_TTL_S', '1800')))
+
+# --- Prediction result cache (keyed by loaded bundle and canonical state; cleared on every artifact swap) ---
+RESULT_CACHE = LRUCache(int(os.environ.get('ML_RESULT_CACHE_SIZE', '50000')),
+                        max_bytes=int(float(os.environ.get('ML_RESULT_CACHE_MB', '64')) * 1024 * 1024),
+                        sizeof=lambda key, result: len(repr(key)) + len(repr(result)))
+
+# --- Instrumentation (METRICS, shared with the scoring stages, lives in triage.py) ---
+PROFILER = SamplingProfiler() # toggled at runtime through /profiler
+
+# --- Artifact Loading ---
+
+def warm_up(bundle):
+    """
+    Validates a freshly loaded bundle with synthetic predictions (every disease's first symptoms, both
+    question strategies) before it takes traffic; this also pages in the weights and fills lazy caches.
+    """
+    if len(bundle.disease_symptom_map) != len(bundle.engine.classes):
+        raise ValueError(f"symptom map has {len(bundle.disease_symptom_map)} diseases, model has {len(bundle.engine.classes)} classes")
+    states = [parse_state({'collected_symptoms': {symptom: 2 for symptom in symptoms[:2]}, 'question_counter': 1, 'question_strategy': strategy})
+              for symptoms in bundle.disease_symptom_map.values() for strategy in ('severity', 'info_gain')]
+    for result in predict_states(states, bundle):
+        confidences = [p['confidence'] for p in result['predictions']]
+        if not all(math.isfinite(c) for c in confidences) or not 0 < confidences[0] <= 100:
+            raise ValueError(f"warm-up produced invalid confidences {confidences}")
+
+RELOAD_LOCK = threading.Lock()
+RELOAD_STATUS = {'state': 'idle', 'version': None, 'error': None, 'started_at': None, 'finished_at': None}
+
+def load_artifacts(artifacts_dir=None):
+    """
+    Loads, validates and warms a new bundle next to the one being served, then swaps it in. In-flight
+    requests finish on the bundle they started with; on any failure the current bundle keeps serving.
+    """
+    global BUNDLE
+    if not RELOAD_LOCK.acquire(blocking=False): return False # a reload is already running
+    started = time.perf_counter()
+    RELOAD_STATUS.update(state='loading', error=None, started_at=time.time(), finished_at=None)
     try:
-        ENCODER = joblib.load('artifacts/label_encoder.pkl')
-        VECTORIZER = joblib.load('artifacts/tfidf_vectorizer.pkl')
-        with open('artifacts/disease_symptom_map.json', 'r') as f: DISEASE_SYMPTOM_MAP = json.load(f)
-        MODEL = SymptomClassifier(len(VECTORIZER.vocabulary_), len(ENCODER.classes_)).to(DEVICE)
-        MODEL.load_state_dict(torch.load('artifacts/model_weights.pth', map_location=DEVICE))
-        MODEL.eval()
-        print("✅ ML artifacts loaded successfully.")
+        bundle = build_bundle(artifacts_dir or resolve_artifacts_dir(ARTIFACTS_ROOT))
+        warm_up(bundle)
+        previous, BUNDLE = BUNDLE, bundle
+        # A swap may keep the version and change only the temperature (serving_config.json) or precision; result
+        # keys carry the bundle, so nothing stale is served, and clearing frees the old entries at once.
+        if previous is not None:
+            RESULT_CACHE.clear()
+            SESSION_CACHE.clear()
+        METRICS.replace_gauge('ml_artifact_info', 1, version=bundle.version, engine=bundle.engine.name, precision=getattr(bundle.engine, 'precision', 'float32'))
+        METRICS.set_gauge('ml_artifact_load_seconds', time.perf_counter() - started)
+        METRICS.set_gauge('ml_temperature', bundle.temperature)
+        METRICS.set_gauge('ml_policy_table_entries', len(bundle.policy_table))
+        METRICS.set_gauge('ml_artifact_loaded_timestamp_seconds', bundle.loaded_at)
+        RELOAD_STATUS.update(state='ok', version=bundle.version, finished_at=time.time())
+        print(f"✅ ML artifacts {bundle.version} loaded successfully ({bundle.engine.name} engine, {getattr(bundle.engine, 'precision', 'float32')}).")
+        return True
     except Exception as e:
+        METRICS.inc('ml_artifact_load_failures_total')
+        RELOAD_STATUS.update(state='failed', error=str(e), finished_at=time.time())
         print(f"❌ FAILED TO LOAD ARTIFACTS: {e}")
+        return False
+    finally:
+        RELOAD_LOCK.release()
+
+def reload_in_background(artifacts_dir=None):
+    threading.Thread(target=load_artifacts, args=(artifacts_dir,), name='artifact-reload', daemon=True).start()
+
+def lookup_result(state, bundle):
+    """A precompiled policy entry or a cached result for the state (or None), and the result cache key to store a fresh one under."""
+    key = result_cache_key(state)
+    compiled = bundle.policy_table.get(key)
+    if compiled is not None:
+        METRICS.inc('ml_policy_table_hits_total')
+        return json.loads(compiled), None
+    cache_key = (bundle.version, bundle.loaded_at, key) # per loaded bundle: a reload may change the temperature or precision, not the version
+    return RESULT_CACHE.get(cache_key), cache_key
+
+def score_state(state, bundle):
+    """One state's response: from the policy table or result cache when possible, else live (through the micro-batcher if on)."""
+    with METRICS.stage('result_cache'):
+        result, cache_key = lookup_result(state, bundle)
+    if result is None:
+        if PREDICT_BATCHER is None: result = predict_states([state], bundle)[0]
+        else:
+            future = PREDICT_BATCHER.submit((state, bundle))
+            try: result = future.result(timeout=MICROBATCH_TIMEOUT_S)
+            except FutureTimeoutError:
+                future.cancel() # still queued: the batcher skips it instead of scoring it for nobody
+                raise
+        RESULT_CACHE.put(cache_key, result)
+    return result
 
 @app.route('/predict', methods=['POST'])
 def predict():
-    if not all([MODEL, VECTORIZER, ENCODER, DISEASE_SYMPTOM_MAP]):
+    """
+    Stateless by default. With a session_id the state is cached server-side, and later turns
+    may send just {'session_id', 'answer': {symptom_token, has_symptom, severity}}. If the
+    session is not cached, the full payload is used when present; otherwise 409 asks for it.
+    """
+    bundle = BUNDLE # one version for the whole request, even if a reload swaps BUNDLE meanwhile
+    if bundle is None:
+        METRICS.inc('ml_rejected_total', reason='not_loaded')
         return jsonify({'error': 'Model artifacts not loaded.'}), 503
     try:
-        data = request.get_json()
-        collected_symptoms = data.get('collected_symptoms', {})
-        denied_symptoms = data.get('denied_symptoms', [])
-        question_counter = data.get('question_counter', 0)
-        user_medical_history = data.get('user_medical_history', []) # Expects a list of strings
-
-        if not collected_symptoms:
+        with METRICS.stage('parse'):
+            data = request.get_json()
+            session_id = data.get('session_id')
+            cached = SESSION_CACHE.get(session_id) if session_id is not None and 'answer' in data else None
+            # Session rows index the vocabulary of the version that built them; after a reload they are resent.
+            cached_state = cached[1] if cached is not None and cached[0] == bundle.version else None
+            if cached_state is not None:
+                if not valid_answer(data['answer']):
+                    return jsonify({'error': "'answer' must be an object with a string 'symptom_token' and an optional numeric 'severity'."}), 400
+                state = apply_answer(cached_state, data['answer'], bundle)
+            elif 'answer' in data and not data.get('collected_symptoms'):
+                return jsonify({'error': 'Session state not cached; resend the full payload.', 'resync': True}), 409
+            elif state_error(data):
+                return jsonify({'error': state_error(data)}), 400
+            else:
+                state = canonicalize_state(parse_state(data), bundle)
+                if session_id is not None: prime_session_state(state, bundle)
+        if not state['collected_symptoms']:
             return jsonify({'error': 'No symptoms provided.'}), 400
 
-        symptoms_string = " ".join(collected_symptoms.keys())
-        X_vector = VECTORIZER.transform([symptoms_string]).toarray()
-        for symptom, severity in collected_symptoms.items():
-            if symptom in VECTORIZER.vocabulary_:
-                X_vector[0, VECTORIZER.vocabulary_[symptom]] *= (1 + (severity - 1) * 0.5)
-        
-        with torch.no_grad():
-            probabilities = F.softmax(MODEL(torch.tensor(X_vector, dtype=torch.float32).to(DEVICE)) / TEMPERATURE, dim=1)
-        
-        history_matches = analyze_medical_history(set(collected_symptoms.keys()), user_medical_history)
-        if history_matches:
-            prob_list = probabilities.flatten().tolist()
-            for i, disease_name in enumerate(ENCODER.classes_):
-                normalized_disease = disease_name.replace('_', ' ')
-                for history_condition, match_score in history_matches.items():
-                    if normalized_disease.lower() == history_condition.replace('_', ' ').lower():
-                        prob_list[i] += prob_list[i] * 0.15 * match_score
-            probabilities = torch.tensor([[p / sum(prob_list) for p in prob_list]], dtype=torch.float32)
-
-        top_probs, top_indices = torch.topk(probabilities, k=min(5, len(ENCODER.classes_)))
-        decoded_predictions = [{'disease': ENCODER.inverse_transform([idx.item()])[0], 'confidence': p.item() * 100} for p, idx in zip(top_probs.flatten(), top_indices.flatten())]
-        
-        top_predicted_disease, top_confidence = decoded_predictions[0]['disease'], decoded_predictions[0]['confidence']
-        medical_history_note = None
-        if history_matches:
-            top_disease_normalized = top_predicted_disease.replace('_', ' ').lower()
-            for condition, score in history_matches.items():
-                if top_disease_normalized == condition.replace('_', ' ').lower():
-                    medical_history_note = f"Note: Symptoms show a {(score*100):.0f}% overlap with your pre-existing condition: '{condition}'."
-                    break
-        
-        # Decide whether we have enough confidence to stop asking questions.
-        # Removed the hard limit of 7 questions so the flow is
-        # driven purely by confidence and available distinguishing symptoms.
-        is_final = top_confidence >= (98.0 if question_counter == 0 else 85.0) and question_counter > 0
-        next_question = None
-        if not is_final:
-            next_symptom_token = get_next_question(probabilities, collected_symptoms, denied_symptoms)
-            if next_symptom_token:
-                next_question = {"token": next_symptom_token, "text": f"Are you experiencing '{next_symptom_token.replace('_', ' ')}'?"}
-            else: is_final = True
-
-        return jsonify({'predictions': decoded_predictions, 'is_final': is_final, 'next_question': next_question, 'medical_history_note': medical_history_note})
+        result = score_state(state, bundle)
+        if session_id is not None:
+            if result['is_final']: SESSION_CACHE.pop(session_id)
+            else: SESSION_CACHE.put(session_id, (bundle.version, state))
+        with METRICS.stage('serialize'):
+            return jsonify(result)
+    except QueueFullError:
+        METRICS.inc('ml_rejected_total', reason='queue_full')
+        return jsonify({'error': 'Prediction queue is full, retry shortly.'}), 503
+    except FutureTimeoutError:
+        METRICS.inc('ml_rejected_total', reason='timeout')
+        return jsonify({'error': f'Prediction timed out after {MICROBATCH_TIMEOUT_S:g} s, retry shortly.'}), 503
     except Exception as e:
         print(f"Prediction Error: {e}")
         return jsonify({'error': 'Internal server error during prediction.'}), 500
 
+@app.route('/vocab', methods=['GET'])
+def vocab():
+    """Handshake for /predict/bin: the id tables of the served artifact version. Clients cache it by ETag."""
+    bundle = BUNDLE
+    if bundle is None: return jsonify({'error': 'Model artifacts not loaded.'}), 503
+    if request.if_none_match.contains(bundle.version): return Response(status=304, headers={'ETag': f'"{bundle.version}"'})
+    response = jsonify(binary_protocol.vocab(bundle))
+    response.set_etag(bundle.version)
+    return response
+
+@app.route('/predict/bin', methods=['POST'])
+def predict_binary():
+    """
+    /predict with the struct-packed encoding of binary_protocol.py: integer symptom, condition and class ids
+    from /vocab instead of strings. Stateless; errors are JSON. A 409 means the ids are for other artifacts.
+    """
+    bundle = BUNDLE
+    if bundle is None:
+        METRICS.inc('ml_rejected_total', reason='not_loaded')
+        return jsonify({'error': 'Model artifacts not loaded.'}), 503
+    try:
+        with METRICS.stage('parse'):
+            state = binary_protocol.decode_request(request.get_data(cache=False), bundle)
+    except binary_protocol.VersionMismatch as e:
+        return jsonify({'error': f'Ids are for artifacts {e}; fetch /vocab again.', 'resync': True, 'version': bundle.version}), 409
+    except (struct.error, ValueError, IndexError) as e:
+        return jsonify({'error': f'Malformed request: {e}'}), 400
+    if not state['collected_symptoms']:
+        return jsonify({'error': 'No symptoms provided.'}), 400
+    try:
+        result = score_state(state, bundle)
+        with METRICS.stage('serialize'):
+            return Response(binary_protocol.encode_response(result, bundle), mimetype=binary_protocol.CONTENT_TYPE)
+    except QueueFullError:
+        METRICS.inc('ml_rejected_total', reason='queue_full')
+        return jsonify({'error': 'Prediction queue is full, retry shortly.'}), 503
+    except FutureTimeoutError:
+        METRICS.inc('ml_rejected_total', reason='timeout')
+        return jsonify({'error': f'Prediction timed out after {MICROBATCH_TIMEOUT_S:g} s, retry shortly.'}), 503
+    except Exception as e:
+        print(f"Prediction Error: {e}")
+        return jsonify({'error': 'Internal server error during prediction.'}), 500
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """Scores many triage states at once. Results come back in input order; invalid states get an error entry."""
+    bundle = BUNDLE # one version for the whole request, even if a reload swaps BUNDLE meanwhile
+    if bundle is None:
+        METRICS.inc('ml_rejected_total', reason='not_loaded')
+        return jsonify({'error': 'Model artifacts not loaded.'}), 503
+    try:
+        raw_states = request.get_json().get('states', [])
+        if not isinstance(raw_states, list) or not raw_states:
+            return jsonify({'error': 'No states provided.'}), 400
+        if len(raw_states) > MAX_BATCH_STATES:
+            return jsonify({'error': f'Batch too large (max {MAX_BATCH_STATES} states).'}), 400
+
+        # A malformed state fails only its own slot, not the whole batch.
+        errors = [state_error(raw_state) for raw_state in raw_states]
+        states = [None if error else canonicalize_state(parse_state(raw_state), bundle) for raw_state, error in zip(raw_states, errors)]
+        results = [{'error': error or 'No symptoms provided.'} for error in errors]
+        cache_keys, miss_rows = {}, []
+        for row, state in enumerate(states):
+            if state is None or not state['collected_symptoms']: continue
+            cached_result, cache_keys[row] = lookup_result(state, bundle)
+            if cached_result is None: miss_rows.append(row)
+            else: results[row] = cached_result
+        if miss_rows:
+            for row, result in zip(miss_rows, predict_states([states[row] for row in miss_rows], bundle)):
+                results[row] = result
+                RESULT_CACHE.put(cache_keys[row], result)
+        with METRICS.stage('serialize'):
+            return jsonify({'results': results})
+    except Exception as e:
+        print(f"Batch Prediction Error: {e}")
+        return jsonify({'error': 'Internal server error during prediction.'}), 500
+
+@app.route('/normalize', methods=['POST'])
+def normalize():
+    """
+    Maps free text ({'text': "..."}) or a list of symptom strings ({'symptoms': [...]}) to canonical
+    symptom tokens and their ids, in mention order, and flags emergency symptoms by id.
+    """
+    bundle = BUNDLE
+    if bundle is None: return jsonify({'error': 'Model artifacts not loaded.'}), 503
+    data = request.get_json(silent=True) or {}
+    texts = data.get('symptoms', [])
+    if 'text' in data: texts = [data['text']] + texts if isinstance(texts, list) else None
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        return jsonify({'error': "Provide 'text' as a string or 'symptoms' as a list of strings."}), 400
+    with METRICS.stage('normalize'):
+        matcher = bundle.phrase_matcher
+        token_ids = list(dict.fromkeys(token_id for text in texts for token_id in matcher.extract(text)))
+        emergency = [matcher.tokens[token_id] for token_id in token_ids if token_id in bundle.emergency_ids]
+        return jsonify({'symptoms': [matcher.tokens[token_id] for token_id in token_ids], 'ids': token_ids,
+                        'emergency': bool(emergency), 'emergency_symptoms': emergency, 'version': bundle.version})
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    return jsonify({'batcher': PREDICT_BATCHER.stats() if PREDICT_BATCHER else None, 'session_cache': SESSION_CACHE.stats(),
+                    'result_cache': RESULT_CACHE.stats()})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text exposition: stage latency histograms, response/rejection counters, artifact and cache gauges."""
+    scraped = [('gauge', 'ml_profiler_running', {}, int(PROFILER.running))]
+    for name, cache in (('result', RESULT_CACHE), ('session', SESSION_CACHE)):
+        cache_stats = cache.stats()
+        scraped += [('gauge', f'ml_cache_{field}', {'cache': name}, cache_stats[field]) for field in ('entries', 'bytes')]
+        scraped += [('counter', f'ml_cache_{field}_total', {'cache': name}, cache_stats[field]) for field in ('hits', 'misses', 'evictions', 'expirations')]
+    if PREDICT_BATCHER:
+        batcher_stats = PREDICT_BATCHER.stats()
+        scraped += [('counter', f'ml_batcher_{field}_total', {}, batcher_stats[field]) for field in ('batches', 'items', 'rejected')]
+        scraped.append(('gauge', 'ml_batcher_queue_depth', {}, batcher_stats['queue_depth']))
+    return Response(METRICS.render(scraped), mimetype='text/plain; version=0.0.4')
+
+def admin_allowed():
+    if ADMIN_TOKEN: return request.headers.get('X-Admin-Token') == ADMIN_TOKEN
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+@app.route('/admin/reload', methods=['GET', 'POST'])
+def admin_reload():
+    """
+    POST loads a release in the background and swaps it in once it has passed warm-up: optional
+    {'artifacts_dir': ...}, default is whatever ARTIFACTS_ROOT resolves to; {'wait': true} blocks
+    until done. GET reports the last reload. Under gunicorn this reaches one worker; use ML_RELOAD_WATCH_S there.
+    """
+    if not admin_allowed(): return jsonify({'error': 'Forbidden.'}), 403
+    status = 200
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        if RELOAD_LOCK.locked(): status = 409
+        elif not data.get('wait'):
+            reload_in_background(data.get('artifacts_dir'))
+            status = 202
+        elif not load_artifacts(data.get('artifacts_dir')): status = 500
+    return jsonify({**RELOAD_STATUS, 'serving': BUNDLE.version if BUNDLE else None,
+                    'artifacts_dir': BUNDLE.artifacts_dir if BUNDLE else None}), status
+
+@app.route('/profiler', methods=['GET', 'POST'])
+def profiler():
+    """GET returns the hottest sampled stacks; POST {'enabled': bool, 'interval_ms': float} starts or stops sampling."""
+    if request.method == 'POST':
+        if not admin_allowed(): return jsonify({'error': 'Forbidden.'}), 403
+        data = request.get_json() or {}
+        if data.get('enabled'): PROFILER.start(float(data.get('interval_ms', 10)), reset=data.get('reset', True))
+        else: PROFILER.stop()
+    return jsonify(PROFILER.report(int(request.args.get('top', 50))))
+
+if METRICS.enabled:
+    # Registered only when instrumentation is on, so ML_METRICS=0 adds nothing to the request path.
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        if 'request_started' in g: METRICS.observe(f'request:{request.endpoint}', time.perf_counter() - g.request_started)
+        METRICS.inc('ml_http_responses_total', endpoint=request.endpoint, code=response.status_code)
+        return response
+
+def predict_batched_items(items):
+    """MicroBatcher callback: items are (state, bundle); each bundle's states share one forward pass."""
+    results, groups = [None] * len(items), {}
+    for position, (state, bundle) in enumerate(items): groups.setdefault(id(bundle), (bundle, []))[1].append(position)
+    for bundle, positions in groups.values():
+        for position, result in zip(positions, predict_states([items[p][0] for p in positions], bundle)): results[position] = result
+    return results
+
+PREDICT_BATCHER = MicroBatcher(predict_batched_items, MICROBATCH_MAX_SIZE, MICROBATCH_WAIT_MS, MICROBATCH_MAX_QUEUE) if MICROBATCH_ENABLED else None
+
 with app.app_context():
     load_artifacts()
 
+ARTIFACT_WATCHER = ArtifactWatcher(ARTIFACTS_ROOT, RELOAD_WATCH_S, reload_in_background) if RELOAD_WATCH_S > 0 else None
+if ARTIFACT_WATCHER: ARTIFACT_WATCHER.start() # gunicorn workers start their own in post_fork
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
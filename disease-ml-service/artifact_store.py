@@ -0,0 +1,103 @@
+import argparse
+import hashlib
+import os
+import shutil
+import threading
+import time
+from numpy_engine import BUNDLE_FILE, PRECISION_REPORT, SOURCE_FILES, artifact_version
+from triage import POLICY_FILE, SERVING_CONFIG
+
+# --- Versioned artifact layout ---
+# artifacts/                       flat layout: the files themselves (what train_model.py writes)
+# artifacts/releases/<version>/    versioned layout: one immutable directory per published release
+# artifacts/CURRENT                name of the release to serve; replaced atomically by publish()
+CURRENT_FILE = 'CURRENT'
+RELEASES_DIR = 'releases'
+
+
+def resolve_artifacts_dir(root):
+    """The directory to serve: the release named in root/CURRENT, or root itself for the flat layout."""
+    try:
+        with open(os.path.join(root, CURRENT_FILE), 'r') as f: release = f.read().strip()
+    except FileNotFoundError:
+        return root
+    return os.path.join(root, RELEASES_DIR, release)
+
+
+def release_name(source_dir):
+    """
+    Default release name: the artifact version, plus a hash of serving_config.json when there is one,
+    so a retuned temperature for the same model publishes as a new release instead of colliding.
+    """
+    version = artifact_version(source_dir)
+    try:
+        with open(os.path.join(source_dir, SERVING_CONFIG), 'rb') as f: config = f.read()
+    except FileNotFoundError:
+        return version
+    return f"{version}-{hashlib.sha256(config).hexdigest()[:8]}"
+
+
+def publish(root, source_dir, release=None):
+    """Copies a trained artifact directory into root/releases/<release> and points CURRENT at it."""
+    release = release or release_name(source_dir)
+    target = os.path.join(root, RELEASES_DIR, release)
+    if os.path.exists(target): raise FileExistsError(f"Release {release} already exists; releases are immutable.")
+    staging = target + '.tmp'
+    shutil.copytree(source_dir, staging, ignore=shutil.ignore_patterns(RELEASES_DIR, CURRENT_FILE, '*.tmp'))
+    os.replace(staging, target)
+    pointer = os.path.join(root, CURRENT_FILE + '.tmp')
+    with open(pointer, 'w') as f: f.write(release + '\n')
+    os.replace(pointer, os.path.join(root, CURRENT_FILE))
+    return target
+
+
+def fingerprint(root):
+    """
+    Cheap change marker for the watcher: mtimes/sizes of CURRENT and, for the flat layout, of every file a
+    bundle is built from, including the derived ones that save_artifacts() writes after the sources.
+    """
+    marker = []
+    for name in [CURRENT_FILE, SERVING_CONFIG] + SOURCE_FILES + [BUNDLE_FILE, POLICY_FILE, PRECISION_REPORT]:
+        try:
+            stat = os.stat(os.path.join(root, name))
+            marker.append((name, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            continue
+    return tuple(marker)
+
+
+class ArtifactWatcher:
+    """
+    Polls the artifact root and calls on_change() when a new release is published (or the flat
+    files are replaced). Changes are only acted on once they have been stable for one full interval,
+    so a copy in progress is never picked up. Started lazily per process, so it survives a pre-fork.
+    """
+    def __init__(self, root, interval_s, on_change):
+        self.root = root
+        self.interval_s = interval_s
+        self.on_change = on_change
+        self._pid = None
+
+    def start(self):
+        if self._pid == os.getpid(): return
+        self._pid = os.getpid()
+        threading.Thread(target=self._run, name='artifact-watcher', daemon=True).start()
+
+    def _run(self):
+        seen = pending = fingerprint(self.root)
+        while True:
+            time.sleep(self.interval_s)
+            current = fingerprint(self.root)
+            if current != seen and current == pending:
+                seen = current
+                self.on_change()
+            pending = current
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Publish trained artifacts as a new immutable release.")
+    parser.add_argument('source', help="Directory written by train_model.py or sweep.py.")
+    parser.add_argument('--root', default='artifacts')
+    parser.add_argument('--release', help="Release name (default: the artifact version hash, plus the serving config's).")
+    args = parser.parse_args()
+    print(f"✅ Published {publish(args.root, args.source, args.release)}; running services pick it up on reload.")
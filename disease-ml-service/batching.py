@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+class QueueFullError(Exception):
+    """Raised when the scheduler queue is at max depth and a new request must be rejected."""
+
+
+class MicroBatcher:
+    """
+    Collects single requests that arrive within a short window into one batched call.
+    A batch is flushed as soon as it holds `max_batch_size` items or the oldest item has
+    waited `max_wait_ms`, so no caller is delayed by more than the window plus one batch.
+    `process_batch` takes a list of items and must return a list of results in the same order.
+    """
+    def __init__(self, process_batch, max_batch_size=32, max_wait_ms=2.0, max_queue_depth=1024):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue_depth = max_queue_depth
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.batches, self.items, self.rejected, self.errors, self.cancelled = 0, 0, 0, 0, 0
+        self.batch_size_counts = {}
+        self.total_wait, self.max_wait_seen = 0.0, 0.0
+
+    def _ensure_worker(self):
+        # The worker thread is started lazily (and restarted after a fork) because
+        # threads do not survive into forked server workers.
+        if self._pid == os.getpid(): return
+        with self._start_lock:
+            if self._pid == os.getpid(): return
+            self._reset_stats()
+            self._queue = deque()
+            self._cond = threading.Condition()
+            self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+            self._worker.start()
+            self._pid = os.getpid()
+
+    def submit(self, item):
+        """Queues one item and returns a Future resolving to its own result."""
+        future = Future()
+        self._ensure_worker()
+        with self._cond:
+            if len(self._queue) >= self.max_queue_depth:
+                self.rejected += 1
+                raise QueueFullError(f"Micro-batch queue is full ({self.max_queue_depth} pending).")
+            self._queue.append((item, future, time.perf_counter()))
+            self._cond.notify()
+        return future
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            deadline = self._queue[0][2] + self.max_wait
+            while len(self._queue) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0: break
+                self._cond.wait(remaining)
+            return [self._queue.popleft() for _ in range(min(self.max_batch_size, len(self._queue)))]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            # Callers that gave up waiting cancel their futures; those items are dropped, not scored.
+            pending = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+            self.cancelled += len(batch) - len(pending)
+            if not pending: continue
+            batch = pending
+            started = time.perf_counter()
+            waits = [started - enqueued for _, _, enqueued in batch]
+            self.batches += 1
+            self.items += len(batch)
+            self.batch_size_counts[len(batch)] = self.batch_size_counts.get(len(batch), 0) + 1
+            self.total_wait += sum(waits)
+            self.max_wait_seen = max(self.max_wait_seen, max(waits))
+            try:
+                results = self.process_batch([item for item, _, _ in batch])
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                self.errors += 1
+                for _, future, _ in batch:
+                    future.set_exception(e)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'cancelled': self.cancelled,
+            'queue_depth': len(self._queue) if self._pid == os.getpid() else 0,
+            'mean_batch_size': self.items / self.batches if self.batches else 0.0,
+            'batch_size_counts': dict(sorted(self.batch_size_counts.items())),
+            'mean_queue_wait_ms': self.total_wait / self.items * 1000 if self.items else 0.0,
+            'max_queue_wait_ms': self.max_wait_seen * 1000,
+        }
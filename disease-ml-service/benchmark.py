@@ -0,0 +1,189 @@
+import argparse
+import csv
+import http.client
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import app
+import triage
+
+# --- Configuration ---
+CONCURRENCY_LEVELS = [1, 4, 16]
+REQUESTS_PER_LEVEL = 2000
+WARMUP_REQUESTS = 100
+HISTORY_CONDITIONS = sorted({**triage.CHRONIC_DISEASES, **triage.GENETIC_DISEASES})
+REGRESSION_TOLERANCE = 0.10 # Relative slowdown (or throughput drop) reported as a regression by --compare
+COMPARED_METRICS = [('p50_ms', 'lower'), ('p95_ms', 'lower'), ('p99_ms', 'lower'), ('rps', 'higher'), ('peak_rss_mb', 'lower')]
+
+
+def build_payloads(csv_path, count, seed):
+    """
+    Realistic /predict bodies from the dataset rows: a random subset of one row's symptoms with
+    random severities, a few denied symptoms taken from other diseases, sometimes a medical
+    history, and a question_counter as it would be a few turns into a dialogue.
+    """
+    with open(csv_path, newline='') as f:
+        rows = [[s.strip().replace('_', ' ') for s in row['symptoms'].split(',') if s.strip()] for row in csv.DictReader(f)]
+    all_symptoms = sorted({s for symptoms in rows for s in symptoms})
+    rng = random.Random(seed)
+    payloads = []
+    for _ in range(count):
+        symptoms = rng.choice(rows)
+        collected = rng.sample(symptoms, rng.randint(1, len(symptoms)))
+        denied = [s for s in rng.sample(all_symptoms, rng.randint(0, 4)) if s not in symptoms]
+        history = rng.sample(HISTORY_CONDITIONS, rng.choice([0, 0, 0, 1, 2]))
+        payloads.append({
+            'collected_symptoms': {s: rng.randint(1, 5) for s in collected},
+            'denied_symptoms': denied,
+            'question_counter': rng.randint(0, 6),
+            'user_medical_history': history,
+        })
+    return payloads
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+def peak_rss_mb(pid=None):
+    """
+    Peak resident set size of this process, or of a local server process tree by pid (e.g. the
+    gunicorn master plus its workers; shared pages count once per process, so it is an upper bound).
+    """
+    if pid is None: return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    total_kb, pending = 0, [pid]
+    while pending:
+        process = pending.pop()
+        try:
+            with open(f'/proc/{process}/status') as f:
+                total_kb += next(int(line.split()[1]) for line in f if line.startswith('VmHWM:'))
+            with open(f'/proc/{process}/task/{process}/children') as f: pending.extend(int(child) for child in f.read().split())
+        except (OSError, StopIteration):
+            continue
+    return total_kb / 1024
+
+
+def in_process_sender():
+    """One Flask test client per thread: exercises the whole predict() view without a socket."""
+    local = threading.local()
+    def send(payload):
+        if not hasattr(local, 'client'): local.client = app.app.test_client()
+        return local.client.post('/predict', json=payload).status_code
+    return send
+
+
+def http_sender(url):
+    """One keep-alive connection per thread to a running service."""
+    target, local = urlparse(url), threading.local()
+    def send(payload):
+        if not hasattr(local, 'connection'): local.connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+        try:
+            local.connection.request('POST', '/predict', json.dumps(payload), {'Content-Type': 'application/json'})
+            response = local.connection.getresponse()
+            response.read()
+            return response.status
+        except (http.client.HTTPException, OSError):
+            local.connection.close()
+            del local.connection
+            return 0
+    return send
+
+
+def run_level(send, payloads, concurrency, warmup):
+    """Sends every payload once with `concurrency` threads and returns latency/throughput figures."""
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(send, payloads[:warmup]))
+        def timed(payload):
+            started = time.perf_counter()
+            status = send(payload)
+            return time.perf_counter() - started, status
+        started = time.perf_counter()
+        outcomes = list(pool.map(timed, payloads[warmup:]))
+        elapsed = time.perf_counter() - started
+    latencies = sorted(latency * 1000 for latency, _ in outcomes)
+    return {
+        'concurrency': concurrency,
+        'requests': len(outcomes),
+        'errors': sum(status != 200 for _, status in outcomes),
+        'p50_ms': percentile(latencies, 0.50),
+        'p95_ms': percentile(latencies, 0.95),
+        'p99_ms': percentile(latencies, 0.99),
+        'mean_ms': sum(latencies) / len(latencies),
+        'rps': len(outcomes) / elapsed,
+    }
+
+
+def run_benchmark(args):
+    payloads = build_payloads(args.csv, args.requests + args.warmup, args.seed)
+    report = {
+        'config': {'csv': args.csv, 'requests': args.requests, 'warmup': args.warmup, 'seed': args.seed, 'concurrency': args.concurrency},
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+                        'engine': app.BUNDLE.engine.name, 'artifact_version': app.BUNDLE.version,
+                        'env': {name: value for name, value in os.environ.items() if name.startswith('ML_')}},
+        'results': [],
+    }
+    modes = [] if args.url and args.http_only else [('in_process', in_process_sender(), None)]
+    if args.url: modes.append(('http', http_sender(args.url), args.server_pid))
+    for mode, send, pid in modes:
+        for concurrency in args.concurrency:
+            # The result cache would otherwise serve every level after the first from memory.
+            if mode == 'in_process': app.RESULT_CACHE.clear()
+            result = {'mode': mode, **run_level(send, payloads, concurrency, args.warmup)}
+            result['peak_rss_mb'] = peak_rss_mb(pid) if mode == 'http' else peak_rss_mb()
+            report['results'].append(result)
+            print(f"  {mode:<11} c={concurrency:<3} p50 {result['p50_ms']:7.2f} ms  p95 {result['p95_ms']:7.2f} ms  p99 {result['p99_ms']:7.2f} ms"
+                  f"  {result['rps']:8.1f} req/s  errors {result['errors']}  peak RSS {result['peak_rss_mb'] or 0:.0f} MB", file=sys.stderr)
+    return report
+
+
+def compare(report, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Prints per-level changes against a stored run and returns the list of regressions."""
+    baseline_results = {(r['mode'], r['concurrency']): r for r in baseline['results']}
+    regressions = []
+    print(f"{'mode':<11}{'c':>4}  {'metric':<12}{'baseline':>11}{'current':>11}{'change':>9}")
+    for result in report['results']:
+        reference = baseline_results.get((result['mode'], result['concurrency']))
+        if reference is None: continue
+        for metric, better in COMPARED_METRICS:
+            if not reference.get(metric) or result.get(metric) is None: continue
+            change = result[metric] / reference[metric] - 1
+            regressed = change > tolerance if better == 'lower' else change < -tolerance
+            if regressed: regressions.append((result['mode'], result['concurrency'], metric, change))
+            print(f"{result['mode']:<11}{result['concurrency']:>4}  {metric:<12}{reference[metric]:>11.2f}{result[metric]:>11.2f}"
+                  f"{change:>+9.1%}{'  ❌' if regressed else ''}")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Latency/throughput benchmark of /predict on payloads built from the dataset CSV.")
+    parser.add_argument('--csv', default=triage.DATASET_CSV)
+    parser.add_argument('--requests', type=int, default=REQUESTS_PER_LEVEL, help="Timed requests per concurrency level.")
+    parser.add_argument('--warmup', type=int, default=WARMUP_REQUESTS)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=CONCURRENCY_LEVELS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--url', help="Also benchmark a running service over HTTP, e.g. http://127.0.0.1:5001")
+    parser.add_argument('--http-only', action='store_true', help="With --url, skip the in-process runs.")
+    parser.add_argument('--server-pid', type=int, help="Read the peak RSS of the server (and its workers) from /proc for the HTTP runs.")
+    parser.add_argument('--output', help="Write the JSON report here instead of stdout.")
+    parser.add_argument('--compare', metavar='BASELINE_JSON', help="Compare against a previous report; exit 1 on regression.")
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE)
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+    if args.output:
+        with open(args.output, 'w') as f: json.dump(report, f, indent=2)
+    else: print(json.dumps(report, indent=2))
+    if args.compare:
+        with open(args.compare) as f: baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}.")
+            sys.exit(1)
+        print("✅ No regressions against the baseline.")
@@ -0,0 +1,116 @@
+import argparse
+import http.client
+import json
+import sys
+import time
+from urllib.parse import urlparse
+import app
+import triage
+import binary_protocol
+from benchmark import build_payloads, percentile
+
+# --- Configuration ---
+PAYLOADS = 2000
+REPEATS = 5 # Passes over the payloads for the codec timings; the fastest pass is reported
+
+
+def codec_timings(payloads, results, client, repeats=REPEATS):
+    """Per-message cost (µs) of each side's encode/decode step, JSON vs binary, outside any web stack."""
+    bundle = app.BUNDLE
+    json_bodies = [json.dumps(payload).encode() for payload in payloads]
+    binary_bodies = [client.encode_request(payload) for payload in payloads]
+    json_responses = [app.app.json.dumps(result).encode() for result in results]
+    binary_responses = [binary_protocol.encode_response(result, bundle) for result in results]
+    steps = {
+        'client_encode': (lambda: [json.dumps(payload).encode() for payload in payloads],
+                          lambda: [client.encode_request(payload) for payload in payloads]),
+        'server_parse': (lambda: [triage.canonicalize_state(triage.parse_state(json.loads(body)), bundle) for body in json_bodies],
+                         lambda: [binary_protocol.decode_request(body, bundle) for body in binary_bodies]),
+        'server_serialize': (lambda: [app.app.json.dumps(result).encode() for result in results],
+                             lambda: [binary_protocol.encode_response(result, bundle) for result in results]),
+        'client_decode': (lambda: [json.loads(body) for body in json_responses],
+                          lambda: [client.decode_response(body) for body in binary_responses]),
+    }
+    timings = {}
+    for step, (json_step, binary_step) in steps.items():
+        timings[step] = {}
+        for protocol, run in (('json', json_step), ('binary', binary_step)):
+            best = float('inf')
+            for _ in range(repeats):
+                started = time.perf_counter()
+                run()
+                best = min(best, time.perf_counter() - started)
+            timings[step][protocol] = best / len(payloads) * 1e6
+    sizes = {'request_bytes': {'json': sum(map(len, json_bodies)) / len(payloads), 'binary': sum(map(len, binary_bodies)) / len(payloads)},
+             'response_bytes': {'json': sum(map(len, json_responses)) / len(payloads), 'binary': sum(map(len, binary_responses)) / len(payloads)}}
+    return timings, sizes
+
+
+def round_trips(payloads, client, url=None):
+    """
+    Full request latency per protocol: in process through the Flask test client, or over one keep-alive
+    HTTP connection with --url. Both endpoints share the result cache, which a first pass warms, so the
+    difference is the protocol and not the model.
+    """
+    if url:
+        target = urlparse(url)
+        connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+        def post(path, body, content_type):
+            connection.request('POST', path, body, {'Content-Type': content_type})
+            response = connection.getresponse()
+            return response.status, response.read()
+    else:
+        test_client = app.app.test_client()
+        def post(path, body, content_type):
+            response = test_client.post(path, data=body, content_type=content_type)
+            return response.status_code, response.data
+
+    protocols = {
+        'json': lambda payload: json.loads(post('/predict', json.dumps(payload), 'application/json')[1]),
+        'binary': lambda payload: client.decode_response(post('/predict/bin', client.encode_request(payload), binary_protocol.CONTENT_TYPE)[1]),
+    }
+    report = {}
+    for protocol, send in protocols.items():
+        for payload in payloads: send(payload) # warm-up, fills the result cache
+        latencies = []
+        for payload in payloads:
+            started = time.perf_counter()
+            send(payload)
+            latencies.append((time.perf_counter() - started) * 1000)
+        latencies.sort()
+        report[protocol] = {'p50_ms': percentile(latencies, 0.5), 'p99_ms': percentile(latencies, 0.99), 'mean_ms': sum(latencies) / len(latencies)}
+    return report
+
+
+def fetch_vocab(url=None):
+    if not url: return app.app.test_client().get('/vocab').get_json()
+    target = urlparse(url)
+    connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+    connection.request('GET', '/vocab')
+    return json.loads(connection.getresponse().read())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serialization/parse cost and latency of /predict (JSON) against /predict/bin (struct-packed).")
+    parser.add_argument('--csv', default=triage.DATASET_CSV)
+    parser.add_argument('--payloads', type=int, default=PAYLOADS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--url', help="Measure round trips against a running service, e.g. http://127.0.0.1:5001")
+    parser.add_argument('--output', help="Write the JSON report here instead of stdout.")
+    args = parser.parse_args()
+
+    client = binary_protocol.Client(fetch_vocab(args.url))
+    payloads = build_payloads(args.csv, args.payloads, args.seed)
+    results = triage.predict_states([triage.canonicalize_state(triage.parse_state(payload), app.BUNDLE) for payload in payloads], app.BUNDLE)
+    timings, sizes = codec_timings(payloads, results, client)
+    report = {'artifact_version': app.BUNDLE.version, 'payloads': len(payloads), 'codec_us': timings, **sizes,
+              'round_trip': round_trips(payloads, client, args.url)}
+
+    print(f"{'per message':<20}{'json':>10}{'binary':>10}", file=sys.stderr)
+    for step, costs in timings.items(): print(f"{step + ' (µs)':<20}{costs['json']:>10.2f}{costs['binary']:>10.2f}", file=sys.stderr)
+    for name in ('request_bytes', 'response_bytes'): print(f"{name:<20}{sizes[name]['json']:>10.0f}{sizes[name]['binary']:>10.0f}", file=sys.stderr)
+    for metric in ('p50_ms', 'p99_ms', 'mean_ms'):
+        print(f"{'round trip ' + metric:<20}{report['round_trip']['json'][metric]:>10.3f}{report['round_trip']['binary'][metric]:>10.3f}", file=sys.stderr)
+    if args.output:
+        with open(args.output, 'w') as f: json.dump(report, f, indent=2)
+    else: print(json.dumps(report, indent=2))
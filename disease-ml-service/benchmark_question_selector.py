@@ -0,0 +1,28 @@
+import argparse
+import statistics
+import simulate_dialogues
+
+# --- Configuration ---
+STRATEGIES = ["severity", "info_gain"]
+
+
+def benchmark(trials_per_disease, seed, workers=1):
+    """Plays the same oracle-patient openings (see simulate_dialogues.py) under each next-question strategy."""
+    cases = simulate_dialogues.build_cases('map', trials_per_disease, seed)
+    print(f"{'strategy':<12}{'sessions':>10}{'mean q':>9}{'p95 q':>8}{'accuracy':>10}{'converged':>11}{'turn ms':>9}{'p95 ms':>8}")
+    for strategy in STRATEGIES:
+        runs = simulate_dialogues.simulate(cases, strategy, workers)
+        questions = sorted(r['questions'] for r in runs)
+        latencies = sorted(r['compute_ms'] / r['turns'] for r in runs)
+        print(f"{strategy:<12}{len(runs):>10}{statistics.mean(questions):>9.2f}{questions[int(0.95 * (len(questions) - 1))]:>8}"
+              f"{sum(r['correct'] for r in runs) / len(runs):>10.1%}{sum(r['converged'] for r in runs) / len(runs):>11.1%}"
+              f"{statistics.mean(latencies):>9.2f}{latencies[int(0.95 * (len(latencies) - 1))]:>8.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare next-question strategies on simulated triage dialogues.")
+    parser.add_argument('--trials', type=int, default=5, help="Dialogues per disease, each with a different opening.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+    benchmark(args.trials, args.seed, args.workers)
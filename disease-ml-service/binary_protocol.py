@@ -0,0 +1,96 @@
+import struct
+
+# --- Wire format (little-endian) of POST /predict/bin ---
+# Integer ids index the tables returned by GET /vocab for the same artifact version.
+# Request:  header, then collected symptom ids (u16 each), their severities (u8 each), denied symptom ids (u16 each)
+#           and medical history condition ids (u16 each).
+# Response: header, then per prediction a class id (u16) and confidence in percent (f32), the next question's
+#           symptom id (u16, NO_ID when there is none) and the medical history note as UTF-8 (u16 length prefix).
+REQUEST_HEADER = struct.Struct('<12sHBHHH') # artifact version, question_counter, strategy, #collected, #denied, #history
+RESPONSE_HEADER = struct.Struct('<12sBB') # artifact version, is_final, #predictions
+PREDICTION = struct.Struct('<Hf')
+NOTE_HEADER = struct.Struct('<HH') # next question id, note length in bytes
+NO_ID = 0xFFFF
+STRATEGIES = ('severity', 'info_gain')
+CONTENT_TYPE = 'application/octet-stream'
+
+
+class VersionMismatch(ValueError):
+    """The client's id tables are for other artifacts; it must fetch /vocab again."""
+
+
+def vocab(bundle):
+    """The /vocab handshake: id tables for one artifact version. Symptom ids below len(phrases) are model phrases."""
+    return {'version': bundle.version, 'symptoms': bundle.phrase_matcher.tokens, 'phrases': len(bundle.symptom_index.phrases),
+            'classes': bundle.engine.classes.tolist(), 'conditions': bundle.history_index.conditions, 'strategies': list(STRATEGIES)}
+
+
+def _version(version):
+    return version.encode('ascii')[:12].ljust(12, b'\0')
+
+
+# --- Server side ---
+def decode_request(body, bundle):
+    """Parses a /predict/bin body into the same state dict parse_state() builds from JSON."""
+    version, question_counter, strategy, n_collected, n_denied, n_history = REQUEST_HEADER.unpack_from(body)
+    if version != _version(bundle.version): raise VersionMismatch(version.rstrip(b'\0').decode('ascii', 'replace'))
+    ids = struct.Struct(f'<{n_collected}H{n_collected}B{n_denied}H{n_history}H')
+    if len(body) != REQUEST_HEADER.size + ids.size: raise ValueError(f"body is {len(body)} bytes, header announces {REQUEST_HEADER.size + ids.size}")
+    values = ids.unpack_from(body, REQUEST_HEADER.size)
+    tokens, conditions = bundle.phrase_matcher.tokens, bundle.history_index.conditions
+    collected_ids, severities = values[:n_collected], values[n_collected:2 * n_collected]
+    denied_ids, history_ids = values[2 * n_collected:2 * n_collected + n_denied], values[2 * n_collected + n_denied:]
+    return {
+        'collected_symptoms': {tokens[symptom_id]: severity for symptom_id, severity in zip(collected_ids, severities)},
+        'denied_symptoms': [tokens[symptom_id] for symptom_id in denied_ids],
+        'question_counter': question_counter,
+        'user_medical_history': [conditions[condition_id] for condition_id in history_ids],
+        'question_strategy': STRATEGIES[strategy],
+    }
+
+
+def encode_response(result, bundle):
+    predictions = result['predictions']
+    next_question = result['next_question']
+    note = (result['medical_history_note'] or '').encode('utf-8')
+    parts = [RESPONSE_HEADER.pack(_version(bundle.version), result['is_final'], len(predictions))]
+    parts += [PREDICTION.pack(bundle.class_ids[p['disease']], p['confidence']) for p in predictions]
+    parts.append(NOTE_HEADER.pack(bundle.phrase_matcher.token_ids[next_question['token']] if next_question else NO_ID, len(note)))
+    parts.append(note)
+    return b''.join(parts)
+
+
+# --- Client side (used by benchmark_protocol.py; other clients mirror it) ---
+class Client:
+    """Encodes /predict payloads and decodes responses with the id tables of one /vocab handshake."""
+    def __init__(self, vocab):
+        self.vocab = vocab
+        self.version = _version(vocab['version'])
+        self.symptom_ids = {symptom: i for i, symptom in enumerate(vocab['symptoms'])}
+        self.condition_ids = {condition: i for i, condition in enumerate(vocab['conditions'])}
+        self.strategy_ids = {strategy: i for i, strategy in enumerate(vocab['strategies'])}
+
+    def encode_request(self, payload):
+        collected = [(self.symptom_ids[symptom], severity) for symptom, severity in payload['collected_symptoms'].items()]
+        denied = [self.symptom_ids[symptom] for symptom in payload.get('denied_symptoms', [])]
+        history = [self.condition_ids[condition] for condition in payload.get('user_medical_history', [])]
+        ids = struct.Struct(f'<{len(collected)}H{len(collected)}B{len(denied)}H{len(history)}H')
+        return (REQUEST_HEADER.pack(self.version, payload.get('question_counter', 0), self.strategy_ids[payload.get('question_strategy', 'severity')],
+                                    len(collected), len(denied), len(history))
+                + ids.pack(*[i for i, _ in collected], *[s for _, s in collected], *denied, *history))
+
+    def decode_response(self, body):
+        version, is_final, n_predictions = RESPONSE_HEADER.unpack_from(body)
+        if version != self.version: raise VersionMismatch(version.rstrip(b'\0').decode('ascii', 'replace'))
+        offset = RESPONSE_HEADER.size
+        predictions = []
+        for _ in range(n_predictions):
+            class_id, confidence = PREDICTION.unpack_from(body, offset)
+            predictions.append({'disease': self.vocab['classes'][class_id], 'confidence': confidence})
+            offset += PREDICTION.size
+        question_id, note_length = NOTE_HEADER.unpack_from(body, offset)
+        offset += NOTE_HEADER.size
+        token = self.vocab['symptoms'][question_id] if question_id != NO_ID else None
+        return {'predictions': predictions, 'is_final': bool(is_final),
+                'next_question': {'token': token, 'text': f"Are you experiencing '{token.replace('_', ' ')}'?"} if token else None,
+                'medical_history_note': body[offset:offset + note_length].decode('utf-8') or None}
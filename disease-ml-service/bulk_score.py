@@ -0,0 +1,132 @@
+import argparse
+import collections
+import contextlib
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+with contextlib.redirect_stdout(sys.stderr): # stdout may be the JSONL output; keep the app's load messages off it
+    import app
+import triage
+
+# --- Configuration ---
+CHUNK_SIZE = app.MAX_BATCH_STATES # Input rows scored per predict_states() call
+IN_FLIGHT_PER_WORKER = 2 # Chunks queued per worker; with the chunk size this bounds memory, whatever the input size
+ID_FIELDS = ('prediction_id', 'id', 'session_id')
+
+
+def read_rows(stream, input_format):
+    """
+    Yields one record per input row: JSONL lines as text (parsed in the workers), CSV rows as dicts.
+    A CSV export of ml_predictions keeps input_vector as JSON text, which the workers decode too.
+    """
+    if input_format == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            if line.strip(): yield line
+
+
+def parse_row(raw, question_counter):
+    """
+    A state plus the row's id and previous prediction. Rows may be a /predict payload, an
+    ml_predictions export (input_vector, confidence, predicted_department) or a bare symptom -> severity dict.
+    """
+    row = json.loads(raw) if isinstance(raw, str) else raw
+    if not isinstance(row, dict): raise ValueError('row is not a JSON object')
+    row_id = next((row[field] for field in ID_FIELDS if field in row), None)
+    previous = None
+    if 'collected_symptoms' in row:
+        data = row
+    else:
+        collected_symptoms = row['input_vector'] if 'input_vector' in row else {k: v for k, v in row.items() if k not in ID_FIELDS}
+        if isinstance(collected_symptoms, str): collected_symptoms = json.loads(collected_symptoms)
+        data = {'collected_symptoms': collected_symptoms, 'question_counter': question_counter}
+        if row.get('predicted_department'):
+            previous = {'disease': row['predicted_department'], 'confidence': float(row['confidence']) if row.get('confidence') not in (None, '') else None}
+    if not isinstance(data['collected_symptoms'], dict) or not data['collected_symptoms']: raise ValueError('no symptoms')
+    data['collected_symptoms'] = {symptom: int(severity) for symptom, severity in data['collected_symptoms'].items()}
+    return triage.parse_state(data), row_id, previous
+
+
+def score_chunk(first_line, rows, question_counter=0):
+    """Scores one chunk with a single batched pass; returns its output lines, in input order, and outcome counts."""
+    bundle = app.BUNDLE
+    outputs, states, positions = [], [], []
+    for line, raw in enumerate(rows, first_line):
+        try:
+            state, row_id, previous = parse_row(raw, question_counter)
+        except (ValueError, TypeError, AttributeError) as e:
+            outputs.append({'line': line, 'error': f'Invalid row: {e}'})
+            continue
+        outputs.append({'line': line, 'id': row_id, 'previous': previous})
+        states.append(triage.canonicalize_state(state, bundle))
+        positions.append(len(outputs) - 1)
+    for position, result in zip(positions, triage.predict_states(states, bundle) if states else []):
+        output = outputs[position]
+        output.update(result)
+        if output['previous'] is None: del output['previous']
+        else: output['changed'] = output['previous']['disease'] != result['predictions'][0]['disease']
+        if output['id'] is None: del output['id']
+    counts = {'scored': len(states), 'errors': len(outputs) - len(states), 'changed': sum(bool(output.get('changed')) for output in outputs)}
+    return [json.dumps(output) for output in outputs], counts
+
+
+def _score_chunk(arguments):
+    return score_chunk(*arguments)
+
+
+def score_stream(rows, out, workers=1, chunk_size=CHUNK_SIZE, question_counter=0):
+    """
+    Reads rows lazily in chunks, scores them (over a process pool when workers > 1) and writes JSONL
+    in input order. At most workers x IN_FLIGHT_PER_WORKER chunks are pending at any time.
+    Returns per-outcome counts.
+    """
+    counts = collections.Counter()
+    def chunks():
+        rows_iter, line = iter(rows), 1
+        while True:
+            chunk = list(itertools.islice(rows_iter, chunk_size))
+            if not chunk: return
+            yield (line, chunk, question_counter)
+            line += len(chunk)
+    def write(scored):
+        lines, chunk_counts = scored
+        out.write(''.join(line + '\n' for line in lines))
+        counts.update(chunk_counts)
+
+    if workers <= 1:
+        for chunk in chunks(): write(score_chunk(*chunk))
+        return counts
+    with triage.worker_pool(workers) as pool:
+        pending = collections.deque()
+        for chunk in chunks():
+            pending.append(pool.apply_async(_score_chunk, (chunk,)))
+            if len(pending) >= workers * IN_FLIGHT_PER_WORKER: write(pending.popleft().get())
+        while pending: write(pending.popleft().get())
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stream-score symptom sets (JSONL or CSV) against the current artifacts, without the web stack.")
+    parser.add_argument('input', nargs='?', default='-', help="JSONL or CSV file, '-' for stdin.")
+    parser.add_argument('--format', choices=['jsonl', 'csv'], help="Default: from the file extension, JSONL for stdin.")
+    parser.add_argument('--output', default='-', help="JSONL output file, '-' for stdout.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--question-counter', type=int, default=0, help="question_counter for rows that carry only symptoms.")
+    args = parser.parse_args()
+    if app.BUNDLE is None: sys.exit("❌ No artifacts loaded.")
+
+    input_format = args.format or ('csv' if args.input.endswith('.csv') else 'jsonl')
+    source = sys.stdin if args.input == '-' else open(args.input, newline='' if input_format == 'csv' else None)
+    out = sys.stdout if args.output == '-' else open(args.output, 'w')
+    started = time.perf_counter()
+    with source, out:
+        counts = score_stream(read_rows(source, input_format), out, args.workers, args.chunk_size, args.question_counter)
+    elapsed = time.perf_counter() - started
+    total = counts['scored'] + counts['errors']
+    print(f"✅ Scored {counts['scored']} rows ({counts['errors']} invalid, {counts['changed']} changed top-1) against artifacts "
+          f"{app.BUNDLE.version} in {elapsed:.1f} s, {total / elapsed if elapsed else 0:.0f} rows/s", file=sys.stderr)
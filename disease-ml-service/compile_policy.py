@@ -0,0 +1,86 @@
+import argparse
+import collections
+import csv
+import gzip
+import itertools
+import json
+import os
+import time
+import triage
+from triage import DATASET_CSV, POLICY_FILE
+
+# --- Configuration ---
+OPENINGS = 300 # Most frequent opening symptom sets (single symptoms, then pairs) that get a compiled tree
+MAX_OPENING_SYMPTOMS = 2
+MAX_DEPTH = 5 # Answered questions explored below each opening
+# Severities as the backend sends them: opening symptoms at its default of 2, the symptom just confirmed at 3.
+# The backend only stores symptom names, so every earlier answer comes back at 2 on the next turn.
+OPENING_SEVERITY = 2
+ANSWER_SEVERITY = 3
+COMPILE_BATCH = 512
+
+
+def frequent_openings(csv_path, count=OPENINGS, max_symptoms=MAX_OPENING_SYMPTOMS):
+    """The opening symptom sets that the most dataset rows contain, most frequent first."""
+    with open(csv_path, newline='') as f:
+        rows = [sorted({s.strip().replace('_', ' ') for s in row['symptoms'].split(',') if s.strip()}) for row in csv.DictReader(f)]
+    frequency = collections.Counter()
+    for symptoms in rows:
+        for size in range(1, max_symptoms + 1): frequency.update(itertools.combinations(symptoms, size))
+    return [list(opening) for opening, _ in sorted(frequency.items(), key=lambda item: (-item[1], item[0]))[:count]]
+
+
+def answer(state, token, has_symptom):
+    collected_symptoms = {symptom: OPENING_SEVERITY for symptom in state['collected_symptoms']}
+    if has_symptom: collected_symptoms[token] = ANSWER_SEVERITY
+    denied_symptoms = state['denied_symptoms'] if has_symptom else state['denied_symptoms'] + [token]
+    return {**state, 'collected_symptoms': collected_symptoms, 'denied_symptoms': denied_symptoms, 'question_counter': state['question_counter'] + 1}
+
+
+def compile_policy(artifacts_dir='artifacts', csv_path=DATASET_CSV, openings=OPENINGS, max_depth=MAX_DEPTH):
+    """
+    Walks the live policy (triage.predict_states) breadth-first from each frequent opening, following the
+    yes and the no answer to every question until the dialogue is final or max_depth answers deep,
+    and writes state -> response for every state reached. States are keyed exactly like the result cache.
+    """
+    started = time.perf_counter()
+    bundle = triage.build_bundle(artifacts_dir)
+    frontier = [triage.canonicalize_state(triage.parse_state({'collected_symptoms': {s: OPENING_SEVERITY for s in opening}}), bundle)
+                for opening in frequent_openings(csv_path, openings)]
+    table = {}
+    for depth in range(max_depth + 1):
+        states = []
+        for state in frontier:
+            key = triage.result_cache_key(state)
+            if key not in table:
+                table[key] = None
+                states.append(state)
+        frontier = []
+        for start in range(0, len(states), COMPILE_BATCH):
+            batch = states[start:start + COMPILE_BATCH]
+            for state, result in zip(batch, triage.predict_states(batch, bundle)):
+                table[triage.result_cache_key(state)] = result
+                if depth < max_depth and not result['is_final'] and result['next_question']:
+                    token = result['next_question']['token']
+                    frontier += [answer(state, token, True), answer(state, token, False)]
+
+    policy = {'artifact_version': bundle.version, 'temperature': bundle.temperature, 'precision': getattr(bundle.engine, 'precision', 'float32'),
+              'logic_hash': triage.policy_logic_hash(bundle.symptom_index), 'question_strategy': triage.QUESTION_STRATEGY, 'openings': openings, 'max_depth': max_depth,
+              'entries': [[key, json.dumps(result, separators=(',', ':'))] for key, result in table.items()]}
+    path = os.path.join(artifacts_dir, POLICY_FILE)
+    # mtime=0 keeps the gzip header free of the compile time, so identical inputs give identical bytes.
+    with open(path + '.tmp', 'wb') as f: f.write(gzip.compress(json.dumps(policy, separators=(',', ':')).encode(), mtime=0))
+    os.replace(path + '.tmp', path)
+    print(f"✅ Compiled {len(table)} dialogue states from {openings} openings (depth {max_depth}) "
+          f"into {path} ({os.path.getsize(path) / 1024:.0f} KB) in {time.perf_counter() - started:.1f} s")
+    return len(table)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Precompile the question policy for frequent opening symptoms into a lookup table.")
+    parser.add_argument('--artifacts', default='artifacts')
+    parser.add_argument('--csv', default=DATASET_CSV)
+    parser.add_argument('--openings', type=int, default=OPENINGS)
+    parser.add_argument('--depth', type=int, default=MAX_DEPTH)
+    args = parser.parse_args()
+    compile_policy(args.artifacts, args.csv, args.openings, args.depth)
@@ -0,0 +1,97 @@
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import numpy as np
+import torch
+from numpy_engine import artifact_version, dense_to_bags, softmax
+from torch_engine import MAX_FINAL_FLIP_RATE, MAX_LATENCY_RATIO, MIN_TOP1_AGREEMENT, PRECISION_DTYPES, PRECISION_REPORT, TorchEngine
+from train_model import load_features, split_indices, DISEASE_COL
+from triage import load_serving_temperature, reached_confidence
+
+# --- Configuration ---
+ARTIFACTS_DIR = 'artifacts'
+MODES = ['int8', 'float16', 'bfloat16']
+LATENCY_REPEATS = 200
+LATENCY_PASSES = 5 # The fastest pass is reported, so the float32 comparison is not decided by scheduler noise
+
+
+def model_bytes(engine):
+    """Serialized size of the model as served in this precision."""
+    buffer = io.BytesIO()
+    torch.save(engine.model.state_dict(), buffer)
+    return buffer.getbuffer().nbytes
+
+
+def score(engine, bag_inputs, labels, temperature):
+    logits = engine.forward_bag(*bag_inputs)
+    probabilities = softmax(logits / temperature)
+    top5 = np.argsort(-probabilities, axis=1, kind='stable')[:, :5]
+    # is_final as /predict computes it after the first answered question
+    is_final = np.array([reached_confidence(confidence * 100, 1) for confidence in probabilities.max(axis=1)])
+
+    indices, offsets, weights = bag_inputs
+    end = offsets[1] if len(offsets) > 1 else len(indices)
+    single = (indices[:end], offsets[:1], weights[:end]) # one-row request, the /predict hot path
+    latency_ms = float('inf')
+    for _ in range(LATENCY_PASSES):
+        started = time.perf_counter()
+        for _ in range(LATENCY_REPEATS): engine.forward_bag(*single)
+        latency_ms = min(latency_ms, (time.perf_counter() - started) / LATENCY_REPEATS * 1000)
+    return {'top5': top5, 'is_final': is_final, 'accuracy': float((top5[:, 0] == labels).mean()), 'latency_ms': latency_ms}
+
+
+def evaluate(artifacts_dir=ARTIFACTS_DIR, csv_path=None, modes=MODES):
+    """Scores every reduced-precision mode against float32 on the held-out split and writes the gate report."""
+    reference = TorchEngine(artifacts_dir)
+    df, _, _ = load_features(csv_path)
+    _, test_indices = split_indices(df[DISEASE_COL].values)
+    held_out = df.iloc[test_indices]
+    class_ids = {name: i for i, name in enumerate(reference.classes)}
+    labels = np.array([class_ids.get(name, -1) for name in held_out[DISEASE_COL]])
+    bag_inputs = dense_to_bags(reference.transform_dense(held_out['Cleaned_Symptoms'].tolist()))
+
+    temperature = load_serving_temperature(artifacts_dir)
+    baseline = score(reference, bag_inputs, labels, temperature)
+    report = {'artifact_version': artifact_version(artifacts_dir), 'held_out_rows': len(labels),
+              'float32': {'accuracy': baseline['accuracy'], 'latency_ms': baseline['latency_ms'], 'model_bytes': model_bytes(reference)},
+              'thresholds': {'min_top1_agreement': MIN_TOP1_AGREEMENT, 'max_final_flip_rate': MAX_FINAL_FLIP_RATE, 'max_latency_ratio': MAX_LATENCY_RATIO},
+              'modes': {}}
+    print(f"Held-out rows: {len(labels)}, float32 accuracy {baseline['accuracy']:.2%}, "
+          f"{baseline['latency_ms']:.3f} ms/request, {report['float32']['model_bytes']} bytes")
+
+    for precision in modes:
+        engine = TorchEngine(artifacts_dir, precision=precision)
+        result = score(engine, bag_inputs, labels, temperature)
+        metrics = {
+            'top1_agreement': float((result['top5'][:, 0] == baseline['top5'][:, 0]).mean()),
+            'top5_agreement': float((np.sort(result['top5'], axis=1) == np.sort(baseline['top5'], axis=1)).all(axis=1).mean()),
+            'final_flip_rate': float((result['is_final'] != baseline['is_final']).mean()),
+            'accuracy': result['accuracy'],
+            'latency_ms': result['latency_ms'],
+            'latency_ratio': result['latency_ms'] / baseline['latency_ms'],
+            'model_bytes': model_bytes(engine),
+        }
+        metrics['passed'] = (metrics['top1_agreement'] >= MIN_TOP1_AGREEMENT and metrics['final_flip_rate'] <= MAX_FINAL_FLIP_RATE
+                             and metrics['latency_ratio'] <= MAX_LATENCY_RATIO)
+        report['modes'][precision] = metrics
+        print(f"  {'✅' if metrics['passed'] else '❌'} {precision:<9} top-1 {metrics['top1_agreement']:.2%}, top-5 {metrics['top5_agreement']:.2%}, "
+              f"is_final flips {metrics['final_flip_rate']:.2%}, accuracy {metrics['accuracy']:.2%}, "
+              f"{metrics['latency_ms']:.3f} ms/request ({metrics['latency_ratio']:.2f}x float32), {metrics['model_bytes']} bytes")
+
+    path = os.path.join(artifacts_dir, PRECISION_REPORT)
+    with open(path, 'w') as f: json.dump(report, f, indent=2)
+    print(f"Report written to {path}")
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Gate reduced-precision inference (ML_PRECISION) on held-out agreement with float32.")
+    parser.add_argument('--artifacts', default=ARTIFACTS_DIR)
+    parser.add_argument('--csv', help="Local copy of the dataset (e.g. disease_sympts_prec_full.csv) instead of Hugging Face.")
+    parser.add_argument('--modes', nargs='+', default=MODES, choices=[mode for mode in PRECISION_DTYPES if mode != 'float32'])
+    args = parser.parse_args()
+    report = evaluate(args.artifacts, args.csv, args.modes)
+    sys.exit(0 if any(metrics['passed'] for metrics in report['modes'].values()) else 1)
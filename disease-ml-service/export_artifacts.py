@@ -0,0 +1,88 @@
+import argparse
+import csv
+import os
+import sys
+import time
+import numpy as np
+from numpy_engine import BUNDLE_FILE, NumpyEngine, dense_to_bags, softmax, write_bundle
+from torch_engine import TorchEngine
+from triage import DATASET_CSV
+
+# --- Configuration ---
+ARTIFACTS_DIR = 'artifacts'
+PARITY_TOLERANCE = 1e-4 # Max absolute logit difference accepted between the engines
+
+
+def export_bundle(artifacts_dir=ARTIFACTS_DIR):
+    """Packs the torch weights, IDF vector, vocabulary, classes and symptom map into one bundle file."""
+    engine = TorchEngine(artifacts_dir)
+    params = engine.vectorizer.get_params()
+    if (params['analyzer'] != 'word' or tuple(params['ngram_range']) != (1, 1) or params['stop_words'] or params['strip_accents']
+            or params['preprocessor'] or params['tokenizer'] or params['sublinear_tf'] or params['norm'] != 'l2' or not params['use_idf']):
+        raise ValueError(f"TF-IDF settings not supported by the NumPy engine: {params}")
+
+    weights = {name: tensor.detach().cpu().numpy() for name, tensor in engine.model.state_dict().items()}
+    arrays = {
+        'idf': engine.vectorizer.idf_.astype(np.float64),
+        'layer_1.weight_t': np.ascontiguousarray(weights['layer_1.weight'].T), # gather rows, one per vocabulary term
+        'layer_1.bias': weights['layer_1.bias'],
+        'layer_2.weight': weights['layer_2.weight'],
+        'layer_2.bias': weights['layer_2.bias'],
+        'output_layer.weight': weights['output_layer.weight'],
+        'output_layer.bias': weights['output_layer.bias'],
+    }
+    metadata = {
+        'artifact_version': engine.version,
+        'vocabulary': sorted(engine.vocabulary, key=engine.vocabulary.get),
+        'classes': engine.classes.tolist(),
+        'disease_symptom_map': engine.disease_symptom_map,
+        'token_pattern': params['token_pattern'],
+        'lowercase': params['lowercase'],
+    }
+    path = os.path.join(artifacts_dir, BUNDLE_FILE)
+    write_bundle(path, arrays, metadata)
+    print(f"✅ Model bundle {engine.version} written to {path} ({os.path.getsize(path)} bytes).")
+
+
+def verify_parity(artifacts_dir=ARTIFACTS_DIR, csv_path=DATASET_CSV, tolerance=PARITY_TOLERANCE):
+    """Checks the NumPy engine against the torch reference on every symptom set in the CSV."""
+    started = time.perf_counter()
+    reference = TorchEngine(artifacts_dir)
+    torch_load = time.perf_counter() - started
+    started = time.perf_counter()
+    engine = NumpyEngine(artifacts_dir)
+    numpy_load = time.perf_counter() - started
+
+    with open(csv_path, newline='') as f:
+        texts = [row['symptoms'].replace('_', ' ').replace(',', ' ') for row in csv.DictReader(f)]
+    X_reference, X_engine = reference.transform_dense(texts), engine.transform_dense(texts)
+    bag_inputs = dense_to_bags(X_engine)
+
+    logits_reference = reference.forward_dense(X_reference)
+    checks = {
+        'tfidf_features': np.abs(X_reference - X_engine).max(),
+        'dense_logits': np.abs(logits_reference - engine.forward_dense(X_engine)).max(),
+        'bag_logits': np.abs(logits_reference - engine.forward_bag(*bag_inputs)).max(),
+        'torch_bag_logits': np.abs(logits_reference - reference.forward_bag(*bag_inputs)).max(),
+    }
+    top5_reference = np.argsort(-softmax(logits_reference), axis=1, kind='stable')[:, :5]
+    top5_engine = np.argsort(-softmax(engine.forward_bag(*bag_inputs)), axis=1, kind='stable')[:, :5]
+
+    print(f"Parity over {len(texts)} symptom sets (versions: torch {reference.version}, bundle {engine.version}):")
+    for name, difference in checks.items(): print(f"  max |diff| {name:<18} {difference:.3e}")
+    print(f"  top-1 agreement {(top5_reference[:, 0] == top5_engine[:, 0]).mean():.2%}, top-5 agreement {(top5_reference == top5_engine).all(axis=1).mean():.2%}")
+    print(f"  load time: torch {torch_load * 1000:.1f} ms, numpy {numpy_load * 1000:.1f} ms")
+    return reference.version == engine.version and all(difference <= tolerance for difference in checks.values())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export the torch/sklearn artifacts to a single NumPy model bundle.")
+    parser.add_argument('--artifacts', default=ARTIFACTS_DIR)
+    parser.add_argument('--no-verify', action='store_true', help="Skip the parity check against the torch reference.")
+    args = parser.parse_args()
+    export_bundle(args.artifacts)
+    if not args.no_verify:
+        if not verify_parity(args.artifacts):
+            print("❌ NumPy engine does not match the torch reference.")
+            sys.exit(1)
+        print("✅ NumPy engine matches the torch reference.")
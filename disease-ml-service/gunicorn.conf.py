@@ -0,0 +1,31 @@
+# Production launch for the ML service:
+#   gunicorn -c gunicorn.conf.py app:app
+# The app (and its artifacts) is loaded once in the master and the workers are forked from it.
+# With ML_ENGINE=numpy the weights live in a read-only mmap of artifacts/model_bundle.bin; with the
+# torch engine the weights are mmap-loaded as well. Either way the workers share one physical copy
+# of the model instead of each holding their own.
+# Metrics are per worker too: /metrics answers from whichever worker takes the scrape, with a worker label
+# (its pid) on every series, so sum without (worker) over the scraped series for service-wide numbers.
+import multiprocessing
+import os
+
+bind = os.environ.get('ML_BIND', '0.0.0.0:5001')
+workers = int(os.environ.get('ML_WORKERS', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.environ.get('ML_WORKER_THREADS', '4')) # lets ML_MICROBATCH coalesce requests within a worker
+preload_app = True
+timeout = 30
+
+# One intra-op thread per worker by default, so N workers never oversubscribe N cores.
+# These must be set before numpy/torch are imported, i.e. before the app is preloaded.
+TORCH_THREADS = int(os.environ.get('ML_TORCH_THREADS', max(1, multiprocessing.cpu_count() // workers)))
+for variable in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+    os.environ.setdefault(variable, str(TORCH_THREADS))
+
+
+def post_fork(server, worker):
+    import sys
+    if 'torch' in sys.modules: sys.modules['torch'].set_num_threads(TORCH_THREADS)
+    # Threads do not survive the fork: each worker watches for new releases (ML_RELOAD_WATCH_S) itself.
+    service = sys.modules.get('app')
+    if service is not None and service.ARTIFACT_WATCHER: service.ARTIFACT_WATCHER.start()
@@ -0,0 +1,166 @@
+import bisect
+import collections
+import contextlib
+import os
+import sys
+import threading
+import time
+
+# Latency buckets in seconds, from 50 µs (a cache hit) up to 2.5 s (a stalled request).
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+NULL_TIMER = contextlib.nullcontext() # shared no-op returned by Metrics.stage() when instrumentation is off
+
+
+def _labels(labels):
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels) + '}' if labels else ''
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus sense."""
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # last slot is +Inf
+        self.sum, self.count = 0.0, 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[slot] += 1
+            self.sum += value
+            self.count += 1
+
+    def render(self, name, labels=()):
+        with self._lock: counts, total, count = list(self.counts), self.sum, self.count
+        lines, cumulative = [], 0
+        for bound, bucket_count in zip(list(self.buckets) + ['+Inf'], counts):
+            cumulative += bucket_count
+            lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {cumulative}")
+        lines.append(f"{name}_sum{_labels(labels)} {total}")
+        lines.append(f"{name}_count{_labels(labels)} {count}")
+        return lines
+
+
+class _StageTimer:
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+class Metrics:
+    """
+    Stage latency histograms, labelled counters and gauges, rendered as Prometheus text.
+    When disabled every call is a no-op: stage() hands back the shared NULL_TIMER and nothing is recorded.
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.stages = {} # stage name -> Histogram
+        self.counters = collections.Counter() # (name, labels) -> value
+        self.gauges = {} # (name, labels) -> value
+        self._lock = threading.Lock()
+
+    def _histogram(self, stage):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            with self._lock: histogram = self.stages.setdefault(stage, Histogram())
+        return histogram
+
+    def stage(self, name):
+        return _StageTimer(self._histogram(name)) if self.enabled else NULL_TIMER
+
+    def observe(self, stage, seconds):
+        if self.enabled: self._histogram(stage).observe(seconds)
+
+    def inc(self, name, amount=1, **labels):
+        if not self.enabled: return
+        with self._lock: self.counters[(name, tuple(sorted(labels.items())))] += amount
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock: self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def replace_gauge(self, name, value, **labels):
+        """Sets one series and drops every other series of the gauge (info-style gauges whose labels change)."""
+        with self._lock:
+            for key in [key for key in self.gauges if key[0] == name]: del self.gauges[key]
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def render(self, scraped=()):
+        """
+        Prometheus text exposition. scraped holds ('counter' | 'gauge', name, labels dict, value) read at scrape time.
+        Every series carries a worker label (the process id): each gunicorn worker keeps its own registry and a
+        scrape reaches just one of them, so dashboards aggregate with sum without (worker).
+        """
+        with self._lock:
+            counters, gauges, stages = dict(self.counters), dict(self.gauges), dict(self.stages)
+        for kind, name, labels, value in scraped:
+            (counters if kind == 'counter' else gauges)[(name, tuple(sorted(labels.items())))] = value
+
+        worker = (('worker', os.getpid()),)
+        lines = []
+        for kind, series in (('counter', counters), ('gauge', gauges)):
+            for metric in sorted({name for name, _ in series}):
+                lines.append(f"# TYPE {metric} {kind}")
+                lines.extend(f"{metric}{_labels(labels + worker)} {value}" for (name, labels), value in sorted(series.items()) if name == metric)
+        if stages:
+            lines.append("# TYPE ml_stage_seconds histogram")
+            for stage, histogram in sorted(stages.items()): lines.extend(histogram.render('ml_stage_seconds', (('stage', stage),) + worker))
+        return '\n'.join(lines) + '\n'
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler that can be switched on and off at runtime. A daemon thread samples the
+    stacks of all other threads every interval and counts them in collapsed (flamegraph) form.
+    Costs nothing while stopped; while running, the cost is one stack walk per thread per interval.
+    """
+    MAX_DEPTH = 64
+
+    def __init__(self):
+        self.samples = collections.Counter()
+        self.interval_s = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_ms=10, reset=True):
+        with self._lock:
+            if self.running: return
+            if reset: self.samples.clear()
+            self.interval_s = interval_ms / 1000
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            if not self.running: return
+            self._stop.set()
+            self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id: continue
+                stack = []
+                while frame is not None and len(stack) < self.MAX_DEPTH:
+                    stack.append(f"{frame.f_code.co_filename.rsplit('/', 1)[-1]}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def report(self, top=50):
+        samples = self.samples.copy()
+        return {'running': self.running, 'interval_ms': self.interval_s * 1000 if self.interval_s else None,
+                'total_samples': sum(samples.values()),
+                'stacks': [{'stack': stack, 'samples': count} for stack, count in samples.most_common(top)]}
@@ -1,18 +1,25 @@
 import torch.nn as nn
+import torch.nn.functional as F
 
 class SymptomClassifier(nn.Module):
     """
     A simple 3-layer Neural Network for symptom classification.
     Input size corresponds to the vocabulary size (number of unique symptoms).
     """
-    def __init__(self, input_size, num_classes):
+    def __init__(self, input_size, num_classes, hidden_1=128, hidden_2=64):
         super(SymptomClassifier, self).__init__()
         
         # Define layers
-        self.layer_1 = nn.Linear(input_size, 128)
+        self.layer_1 = nn.Linear(input_size, hidden_1)
         self.relu = nn.ReLU()
-        self.layer_2 = nn.Linear(128, 64)
-        self.output_layer = nn.Linear(64, num_classes)
+        self.layer_2 = nn.Linear(hidden_1, hidden_2)
+        self.output_layer = nn.Linear(hidden_2, num_classes)
+
+    @classmethod
+    def from_state_dict(cls, state_dict):
+        """Builds a model whose layer sizes match the saved weights (hidden sizes vary between trained models)."""
+        hidden_1, input_size = state_dict['layer_1.weight'].shape
+        return cls(input_size, state_dict['output_layer.weight'].shape[0], hidden_1, state_dict['layer_2.weight'].shape[0])
 
     def forward(self, x):
         out = self.layer_1(x)
@@ -20,4 +27,17 @@ class SymptomClassifier(nn.Module):
         out = self.layer_2(out)
         out = self.relu(out)
         out = self.output_layer(out)
-        return out
\ No newline at end of file
+        return out
+
+    def forward_bag(self, indices, offsets, per_sample_weights):
+        """
+        Same as forward() for sparse inputs given as EmbeddingBag-style bags
+        (flat vocabulary indices, per-row offsets, per-index weights).
+        layer_1 becomes a weighted sum of the selected weight columns instead of a dense matmul.
+        """
+        out = F.embedding_bag(indices, self.layer_1.weight.t(), offsets, mode='sum', per_sample_weights=per_sample_weights) + self.layer_1.bias
+        out = self.relu(out)
+        out = self.layer_2(out)
+        out = self.relu(out)
+        out = self.output_layer(out)
+        return out
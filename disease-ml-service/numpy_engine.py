@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import re
+import struct
+import numpy as np
+
+# --- Bundle file layout ---
+# MAGIC | uint32 format version | uint64 header length | JSON header | zero padding | arrays...
+# Every array starts on a 64-byte boundary so it can be viewed straight out of a read-only mmap.
+MAGIC = b"JPMB"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+BUNDLE_FILE = 'model_bundle.bin'
+SOURCE_FILES = ['model_weights.pth', 'tfidf_vectorizer.pkl', 'label_encoder.pkl', 'disease_symptom_map.json']
+PRECISION_REPORT = 'precision_report.json' # written by evaluate_precision.py, read by torch_engine.precision_gate
+
+
+def artifact_version(artifacts_dir='artifacts'):
+    """Content hash of the source artifacts, shared by the torch engine and the bundle exported from them."""
+    digest = hashlib.sha256()
+    for name in SOURCE_FILES:
+        with open(os.path.join(artifacts_dir, name), 'rb') as f: digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+def write_bundle(path, arrays, metadata):
+    """Writes named numpy arrays plus JSON-serialisable metadata as one memory-mappable file."""
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header = json.dumps({'format_version': FORMAT_VERSION, 'metadata': metadata, 'arrays': layout}).encode('utf-8')
+    data_start = -(-(len(MAGIC) + 12 + len(header)) // ALIGNMENT) * ALIGNMENT
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<IQ', FORMAT_VERSION, len(header)) + header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]['offset'])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+def read_bundle(path):
+    """Maps a bundle read-only and returns (metadata, {name: zero-copy array view})."""
+    buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    if bytes(buffer[:len(MAGIC)]) != MAGIC: raise ValueError(f"{path} is not a model bundle")
+    format_version, header_length = struct.unpack('<IQ', bytes(buffer[len(MAGIC):len(MAGIC) + 12]))
+    if format_version != FORMAT_VERSION: raise ValueError(f"Unsupported bundle format version {format_version}")
+    header_end = len(MAGIC) + 12 + header_length
+    header = json.loads(bytes(buffer[len(MAGIC) + 12:header_end]).decode('utf-8'))
+    data_start = -(-header_end // ALIGNMENT) * ALIGNMENT
+
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype, shape = np.dtype(spec['dtype']), tuple(spec['shape'])
+        count = int(np.prod(shape)) if shape else 1
+        arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + spec['offset']).reshape(shape)
+    return header['metadata'], arrays
+
+
+def dense_to_bags(X_matrix):
+    """Converts dense feature rows to (indices, offsets, weights) EmbeddingBag inputs."""
+    rows, cols = np.nonzero(X_matrix)
+    offsets = np.searchsorted(rows, np.arange(len(X_matrix))).astype(np.int64)
+    return cols.astype(np.int64), offsets, X_matrix[rows, cols].astype(np.float32)
+
+
+def softmax(logits):
+    shifted = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return shifted / shifted.sum(axis=1, keepdims=True)
+
+
+class NumpyEngine:
+    """
+    Pure-NumPy serving engine over a model bundle: TF-IDF tokenisation, IDF lookup and the three
+    Linear layers of SymptomClassifier. Imports neither torch nor sklearn, and all weights stay in
+    the shared read-only mapping of the bundle file.
+    """
+    name = 'numpy'
+
+    def __init__(self, artifacts_dir='artifacts'):
+        metadata, arrays = read_bundle(os.path.join(artifacts_dir, BUNDLE_FILE))
+        self.version = metadata['artifact_version']
+        self.vocabulary = {term: i for i, term in enumerate(metadata['vocabulary'])}
+        self.classes = np.asarray(metadata['classes'], dtype=object)
+        self.disease_symptom_map = metadata['disease_symptom_map']
+        self.idf = arrays['idf'].tolist()
+
+        token_re = re.compile(metadata['token_pattern'])
+        lowercase = metadata['lowercase']
+        self.analyzer = lambda doc: token_re.findall(doc.lower() if lowercase else doc)
+
+        self.layer_1_weight_t, self.layer_1_bias = arrays['layer_1.weight_t'], arrays['layer_1.bias']
+        self.layer_2_weight, self.layer_2_bias = arrays['layer_2.weight'], arrays['layer_2.bias']
+        self.output_weight, self.output_bias = arrays['output_layer.weight'], arrays['output_layer.bias']
+
+    def _head(self, hidden):
+        hidden = np.maximum(hidden + self.layer_1_bias, 0)
+        hidden = np.maximum(hidden @ self.layer_2_weight.T + self.layer_2_bias, 0)
+        return hidden @ self.output_weight.T + self.output_bias
+
+    def forward_bag(self, indices, offsets, weights):
+        """Logits for EmbeddingBag-style inputs: layer_1 is a weighted gather-sum of weight rows."""
+        lengths = np.diff(np.append(offsets, len(indices)))
+        hidden = np.zeros((len(offsets), self.layer_1_weight_t.shape[1]), dtype=np.float32)
+        non_empty = lengths > 0
+        if non_empty.any():
+            gathered = self.layer_1_weight_t[indices] * weights[:, None]
+            hidden[non_empty] = np.add.reduceat(gathered, offsets[non_empty], axis=0)
+        return self._head(hidden)
+
+    def forward_dense(self, X_matrix):
+        return self._head(X_matrix.astype(np.float32) @ self.layer_1_weight_t)
+
+    def transform_dense(self, texts):
+        """Dense l2-normalised TF-IDF rows, equivalent to TfidfVectorizer.transform(texts).toarray()."""
+        X_matrix = np.zeros((len(texts), len(self.vocabulary)))
+        for row, text in enumerate(texts):
+            for token in self.analyzer(text):
+                index = self.vocabulary.get(token)
+                if index is not None: X_matrix[row, index] += 1
+        X_matrix *= np.asarray(self.idf)
+        norms = np.sqrt((X_matrix * X_matrix).sum(axis=1, keepdims=True))
+        return np.divide(X_matrix, norms, out=X_matrix, where=norms > 0)
@@ -0,0 +1,102 @@
+import re
+
+SEGMENT_SPLIT = re.compile(r'[,;.\n/|]+') # phrases never span these
+WORD = re.compile(r'[a-z0-9]+')
+
+
+def stem(word):
+    """Folds simple inflections ("pains", "seizures", "coughing") onto one form; surface forms and input get the same folding."""
+    if len(word) > 5 and word.endswith('ing'): return word[:-3]
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')): return word[:-1]
+    return word
+
+
+def split_words(text):
+    """Lowercased words of one text segment; underscores, hyphens and brackets separate words like spaces."""
+    return WORD.findall(text.lower().replace('_', ' '))
+
+
+def normalize_words(text):
+    """Lowercased, stemmed words of one text segment."""
+    return [stem(word) for word in split_words(text)]
+
+
+class PhraseMatcher:
+    """
+    Word-level Aho-Corasick automaton built once per artifact version. Every surface form (symptom
+    phrase, vocabulary term, synonym) points at a canonical token, and extract() finds all of them
+    in one left-to-right pass over the words, however many surface forms there are. Overlapping
+    matches resolve leftmost-longest, so "pain behind the eyes" wins over "pain" and "eyes".
+    Surface forms in exact_surfaces only match their own unstemmed words ("fits" but not "fit").
+    """
+    def __init__(self, entries, exact_surfaces=()):
+        self.tokens = [] # canonical token id -> canonical token
+        self.token_ids = {}
+        self.word_ids = {}
+        self.goto, self.fail, self.output = [{}], [0], [[]] # per state; output holds (length in words, token id, exact words or None)
+        for surface, canonical in entries:
+            if canonical not in self.token_ids:
+                self.token_ids[canonical] = len(self.tokens)
+                self.tokens.append(canonical)
+            self._insert(normalize_words(surface), self.token_ids[canonical], tuple(split_words(surface)) if surface in exact_surfaces else None)
+        self._link()
+
+    def _insert(self, words, token_id, exact_words=None):
+        if not words: return
+        state = 0
+        for word in words:
+            word_id = self.word_ids.setdefault(word, len(self.word_ids))
+            if word_id not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[state][word_id] = len(self.goto) - 1
+            state = self.goto[state][word_id]
+        # First entry for a surface form wins; exact entries only stand in front of it for their own unstemmed words.
+        if all(exact is not None and exact != exact_words for _, _, exact in self.output[state]):
+            self.output[state].append((len(words), token_id, exact_words))
+
+    def _link(self):
+        """Breadth-first failure links; each state's output also gets the outputs of its failure chain."""
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for word_id, child in self.goto[state].items():
+                fallback = self.fail[state]
+                while fallback and word_id not in self.goto[fallback]: fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(word_id, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+                queue.append(child)
+
+    def matches(self, text):
+        """Non-overlapping (start word, end word, token id) matches of one text, leftmost-longest, in text order."""
+        found, position = [], 0
+        for segment in SEGMENT_SPLIT.split(text):
+            state, words = 0, split_words(segment)
+            for index, word in enumerate(words):
+                word_id = self.word_ids.get(stem(word))
+                if word_id is None: state = 0 # no surface form contains this word
+                else:
+                    while state and word_id not in self.goto[state]: state = self.fail[state]
+                    state = self.goto[state].get(word_id, 0)
+                    matched = set() # lengths already matched at this word
+                    for length, token_id, exact in self.output[state]:
+                        if length in matched or (exact is not None and tuple(words[index - length + 1:index + 1]) != exact): continue
+                        matched.add(length)
+                        found.append((position - length + 1, position + 1, token_id))
+                position += 1
+        chosen, covered_until = [], 0
+        for start, end, token_id in sorted(found, key=lambda m: (m[0], m[0] - m[1])):
+            if start >= covered_until:
+                chosen.append((start, end, token_id))
+                covered_until = end
+        return chosen
+
+    def extract(self, text):
+        """Canonical token ids found in the text, first occurrence order, without repeats."""
+        return list(dict.fromkeys(token_id for _, _, token_id in self.matches(text)))
+
+    def canonical(self, symptom):
+        """Canonical tokens for one symptom key: itself when already canonical, else whatever it mentions."""
+        token_id = self.token_ids.get(symptom)
+        if token_id is not None: return [symptom]
+        return [self.tokens[token_id] for token_id in self.extract(symptom)]
@@ -0,0 +1,157 @@
+import argparse
+import collections
+import csv
+import json
+import os
+import random
+import statistics
+import time
+import app
+import triage
+
+# --- Configuration ---
+INITIAL_SYMPTOMS = 2 # Symptoms the simulated patient volunteers up front
+MAX_QUESTIONS = 25 # A dialogue that has not finalized by then counts as not converged
+CHUNK_SIZE = 256 # Dialogues a worker runs in lockstep, one batched predict_states() call per turn
+ROUND_TRIP_MS = 0.0 # Client/network time added per round trip when estimating time-to-final
+REPORTED_FAILURES = 20
+
+
+def build_cases(oracle, trials_per_disease, seed, csv_path=triage.DATASET_CSV, limit=None, history_rate=0.0):
+    """
+    Oracle patients as (disease, true symptom set, opening symptoms, medical history).
+    'map' uses each disease's full symptom set from disease_symptom_map.json, `trials_per_disease`
+    times with different openings; 'csv' makes every dataset row its own patient.
+    """
+    rng = random.Random(seed)
+    if oracle == 'map':
+        patients = [(disease, symptoms) for disease, symptoms in sorted(app.BUNDLE.disease_symptom_map.items()) for _ in range(trials_per_disease)]
+    else:
+        with open(csv_path, newline='') as f:
+            patients = [(row['disease'], [s.strip().replace('_', ' ') for s in row['symptoms'].split(',') if s.strip()]) for row in csv.DictReader(f)]
+        if limit: patients = rng.sample(patients, min(limit, len(patients)))
+    conditions = sorted({**triage.CHRONIC_DISEASES, **triage.GENETIC_DISEASES})
+    return [(disease, sorted(set(symptoms)), rng.sample(symptoms, min(INITIAL_SYMPTOMS, len(symptoms))),
+             [rng.choice(conditions)] if rng.random() < history_rate else [])
+            for disease, symptoms in patients]
+
+
+def simulate_chunk(cases, strategy='severity', severity=triage.HYPOTHETICAL_SEVERITY):
+    """
+    Plays every dialogue of the chunk to the end through triage.predict_states()/apply_answer(), the
+    same code that serves /predict. Active dialogues advance together, one batched call per turn;
+    each dialogue is charged its share of that call's time.
+    """
+    bundle = app.BUNDLE
+    states, truths, records = [], [], []
+    for disease, symptoms, opening, history in cases:
+        state = triage.parse_state({'collected_symptoms': {s: severity for s in opening}, 'user_medical_history': history, 'question_strategy': strategy})
+        states.append(triage.prime_session_state(state, bundle))
+        truths.append(set(symptoms))
+        records.append({'disease': disease, 'opening': opening, 'history': history, 'turns': 0, 'compute_ms': 0.0})
+
+    active = list(range(len(cases)))
+    while active:
+        started = time.perf_counter()
+        results = triage.predict_states([states[i] for i in active], bundle)
+        share_ms = (time.perf_counter() - started) * 1000 / len(active)
+        still_active = []
+        for i, result in zip(active, results):
+            record, state = records[i], states[i]
+            record['turns'] += 1
+            record['compute_ms'] += share_ms
+            if result['is_final'] or state['question_counter'] >= MAX_QUESTIONS:
+                top = result['predictions'][0]
+                if not result['is_final']: reason = 'max_questions'
+                elif triage.reached_confidence(top['confidence'], state['question_counter']): reason = 'confident'
+                else: reason = 'exhausted' # no distinguishing question left
+                record.update({'questions': state['question_counter'], 'reason': reason, 'converged': result['is_final'],
+                               'predicted': top['disease'], 'confidence': top['confidence'], 'correct': top['disease'] == record['disease']})
+                continue
+            token = result['next_question']['token']
+            states[i] = triage.apply_answer(state, {'symptom_token': token, 'has_symptom': token in truths[i], 'severity': severity}, bundle)
+            still_active.append(i)
+        active = still_active
+    return records
+
+
+def _simulate_chunk(arguments):
+    return simulate_chunk(*arguments)
+
+
+def simulate(cases, strategy='severity', workers=1, severity=triage.HYPOTHETICAL_SEVERITY):
+    """Runs all dialogues, split into chunks over a process pool; records come back in case order."""
+    chunks = [(cases[start:start + CHUNK_SIZE], strategy, severity) for start in range(0, len(cases), CHUNK_SIZE)]
+    if workers <= 1: return [record for chunk in chunks for record in simulate_chunk(*chunk)]
+    with triage.worker_pool(workers) as pool:
+        return [record for chunk in pool.imap(_simulate_chunk, chunks) for record in chunk]
+
+
+def percentiles(values, fractions=(0.5, 0.9, 0.99)):
+    ordered = sorted(values)
+    return {f'p{round(fraction * 100)}': ordered[int(round(fraction * (len(ordered) - 1)))] for fraction in fractions}
+
+
+def summarize(records, round_trip_ms=ROUND_TRIP_MS):
+    """Accuracy at finalization, question and time-to-final distributions, and the dialogues that failed."""
+    questions = [r['questions'] for r in records]
+    finalized = [r for r in records if r['converged']]
+    time_to_final = [r['compute_ms'] + r['turns'] * round_trip_ms for r in finalized]
+    by_disease = collections.defaultdict(list)
+    for r in records: by_disease[r['disease']].append(r['correct'])
+    failures = [r for r in records if not r['converged'] or not r['correct']]
+    return {
+        'sessions': len(records),
+        'accuracy_at_final': sum(r['correct'] for r in finalized) / len(finalized) if finalized else None,
+        'accuracy': sum(r['correct'] for r in records) / len(records),
+        'converged': len(finalized) / len(records),
+        'reasons': dict(collections.Counter(r['reason'] for r in records)),
+        'questions': {'mean': statistics.mean(questions), **percentiles(questions), 'max': max(questions),
+                      'histogram': dict(sorted(collections.Counter(questions).items()))},
+        'round_trips': {'mean': statistics.mean(r['turns'] for r in records)},
+        'time_to_final_ms': {'mean': statistics.mean(time_to_final), **percentiles(time_to_final)} if time_to_final else None,
+        'least_accurate_diseases': sorted(((sum(c) / len(c), d) for d, c in by_disease.items()))[:5],
+        'non_converged': [{k: r[k] for k in ('disease', 'opening', 'history', 'questions', 'predicted')} for r in records if not r['converged']][:REPORTED_FAILURES],
+        'failures': len(failures),
+    }
+
+
+def print_summary(strategy, summary):
+    q, t = summary['questions'], summary['time_to_final_ms']
+    print(f"\n--- {strategy}: {summary['sessions']} dialogues ---")
+    print(f"Accuracy at final: {summary['accuracy_at_final']:.2%} (overall {summary['accuracy']:.2%}), converged {summary['converged']:.2%} {summary['reasons']}")
+    print(f"Questions: mean {q['mean']:.2f}, p50 {q['p50']}, p90 {q['p90']}, p99 {q['p99']}, max {q['max']}")
+    print("  " + "  ".join(f"{n}:{count}" for n, count in q['histogram'].items()))
+    if t: print(f"Time to final: mean {t['mean']:.2f} ms, p50 {t['p50']:.2f} ms, p90 {t['p90']:.2f} ms, p99 {t['p99']:.2f} ms")
+    print("Least accurate: " + ", ".join(f"{disease.strip()} {accuracy:.0%}" for accuracy, disease in summary['least_accurate_diseases']))
+    for r in summary['non_converged'][:5]: print(f"  ❌ never converged: {r['disease'].strip()} from {r['opening']} after {r['questions']} questions")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless triage dialogues against oracle patients, run in parallel.")
+    parser.add_argument('--oracle', choices=['map', 'csv'], default='map', help="Ground truth: disease_symptom_map.json or each CSV row.")
+    parser.add_argument('--csv', default=triage.DATASET_CSV)
+    parser.add_argument('--trials', type=int, default=25, help="Dialogues per disease with --oracle map.")
+    parser.add_argument('--limit', type=int, help="Random sample of CSV patients with --oracle csv.")
+    parser.add_argument('--history-rate', type=float, default=0.0, help="Fraction of patients given one medical history condition.")
+    parser.add_argument('--strategy', nargs='+', default=[triage.QUESTION_STRATEGY], choices=['severity', 'info_gain'])
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--round-trip-ms', type=float, default=ROUND_TRIP_MS, help="Per-turn client/network time added to time-to-final.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the summaries as JSON.")
+    args = parser.parse_args(argv)
+
+    cases = build_cases(args.oracle, args.trials, args.seed, args.csv, args.limit, args.history_rate)
+    summaries = {}
+    for strategy in args.strategy:
+        started = time.perf_counter()
+        summaries[strategy] = summarize(simulate(cases, strategy, args.workers), args.round_trip_ms)
+        print_summary(strategy, summaries[strategy])
+        print(f"({time.perf_counter() - started:.1f} s with {args.workers} worker(s))")
+    if args.output:
+        with open(args.output, 'w') as f: json.dump(summaries, f, indent=2)
+    return summaries
+
+
+if __name__ == '__main__':
+    main()
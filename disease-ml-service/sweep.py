@@ -0,0 +1,159 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import time
+import numpy as np
+import torch
+from sklearn.preprocessing import LabelEncoder
+import train_model
+from train_model import clean_symptoms, csr_to_bags, DISEASE_COL, SYMPTOMS_COL
+from model import SymptomClassifier
+from triage import DATASET_CSV, SERVING_CONFIG, worker_pool
+
+# --- Configuration ---
+GRID = {
+    'max_features': [2000, 100, 50],
+    'hidden_sizes': [(128, 64), (64, 32), (32, 16)],
+    'learning_rate': [0.001, 0.003],
+    'epochs': [10, 20],
+    'batch_size': [32],
+}
+TEMPERATURES = [1.0, 1.5, 2.0, 3.0, 4.0]
+FINAL_CONFIDENCE = 0.85 # /predict's is_final threshold once a question has been answered
+OPENING_SYMPTOMS = 2 # Held-out rows are also scored from this many symptoms, the situation temperature matters in
+LATENCY_REPEATS = 500
+ACCURACY_TOLERANCE = 0.005 # Smaller models within this much of the best accuracy are preferred
+SWEEP_REPORT = 'sweep_report.json'
+
+# max_features -> (vectorizer, X_sparse, X_opening). Built once in the parent and inherited read-only by the
+# forked workers; X_sparse is a memory map of the feature cache, so no worker holds its own copy.
+FEATURES = {}
+LABELS, SPLIT = None, None
+
+
+def prepare(csv_path, max_features_values, seed):
+    global LABELS, SPLIT
+    rng = random.Random(seed)
+    for max_features in max_features_values:
+        df, vectorizer, X_sparse = train_model.load_features(csv_path, max_features)
+        if LABELS is None:
+            label_encoder = LabelEncoder()
+            LABELS = label_encoder.fit_transform(df[DISEASE_COL])
+            SPLIT = train_model.split_indices(LABELS)
+            openings = [",".join(rng.sample(symptoms, min(OPENING_SYMPTOMS, len(symptoms))))
+                        for symptoms in (str(raw).split(',') for raw in df[SYMPTOMS_COL].iloc[SPLIT[1]])]
+            base = (df, label_encoder)
+        X_opening = vectorizer.transform([clean_symptoms(opening) for opening in openings]).astype(np.float32).tocsr()
+        FEATURES[max_features] = (vectorizer, X_sparse, X_opening)
+    return base
+
+
+def configurations(grid):
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def _init_worker(threads):
+    torch.set_num_threads(threads)
+
+
+def run_config(config):
+    """Trains one configuration and measures accuracy, calibration per temperature, size and latency."""
+    started = time.perf_counter()
+    _, X_sparse, X_opening = FEATURES[config['max_features']]
+    train_indices, test_indices = SPLIT
+    model = train_model.train_classifier(X_sparse[train_indices], LABELS[train_indices], int(LABELS.max()) + 1, config['hidden_sizes'],
+                                         config['epochs'], config['batch_size'], config['learning_rate'])
+    y_test = torch.as_tensor(LABELS[test_indices], dtype=torch.long)
+    with torch.no_grad():
+        full_logits = model.forward_bag(*csr_to_bags(X_sparse[test_indices]))
+        opening_logits = model.forward_bag(*csr_to_bags(X_opening))
+        single = csr_to_bags(X_opening[:1])
+        latency_started = time.perf_counter()
+        for _ in range(LATENCY_REPEATS): model.forward_bag(*single)
+        latency_ms = (time.perf_counter() - latency_started) / LATENCY_REPEATS * 1000
+
+    calibration = {}
+    for temperature in TEMPERATURES:
+        probabilities = torch.softmax(opening_logits / temperature, dim=1)
+        confidence, predicted = probabilities.max(dim=1)
+        correct = (predicted == y_test).float()
+        # Expected calibration error over 10 confidence bins.
+        bins = torch.clamp((confidence * 10).long(), max=9)
+        ece = sum((bins == b).float().mean() * abs(correct[bins == b].mean() - confidence[bins == b].mean())
+                  for b in range(10) if (bins == b).any())
+        calibration[str(temperature)] = {
+            'nll': float(torch.nn.functional.cross_entropy(opening_logits / temperature, y_test)),
+            'ece': float(ece),
+            'final_rate': float((confidence >= FINAL_CONFIDENCE).float().mean()),
+            'final_accuracy': float(correct[confidence >= FINAL_CONFIDENCE].mean()) if (confidence >= FINAL_CONFIDENCE).any() else None,
+        }
+    parameters = sum(p.numel() for p in model.parameters())
+    return {
+        'config': {**config, 'hidden_sizes': list(config['hidden_sizes'])},
+        'vocabulary_size': X_sparse.shape[1],
+        'accuracy': float((full_logits.argmax(dim=1) == y_test).float().mean()),
+        'opening_accuracy': float((opening_logits.argmax(dim=1) == y_test).float().mean()),
+        'parameters': parameters,
+        'model_bytes': parameters * 4,
+        'latency_ms': latency_ms,
+        'temperatures': calibration,
+        'best_temperature': float(min(calibration, key=lambda t: calibration[t]['nll'])),
+        'train_seconds': time.perf_counter() - started,
+        'state_dict': {name: tensor.numpy() for name, tensor in model.state_dict().items()},
+    }
+
+
+def select_best(results, tolerance=ACCURACY_TOLERANCE):
+    """Smallest (then fastest) model whose full and opening accuracy are both within tolerance of the best."""
+    best_accuracy = max(r['accuracy'] for r in results)
+    best_opening = max(r['opening_accuracy'] for r in results)
+    candidates = [r for r in results if r['accuracy'] >= best_accuracy - tolerance and r['opening_accuracy'] >= best_opening - tolerance]
+    return min(candidates, key=lambda r: (r['model_bytes'], r['latency_ms']))
+
+
+def sweep(csv_path, output_dir, grid=GRID, workers=os.cpu_count(), seed=0):
+    base_df, label_encoder = prepare(csv_path, grid['max_features'], seed)
+    configs = configurations(grid)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"Sweeping {len(configs)} configurations on {workers} worker(s), {threads} torch thread(s) each...")
+    print(f"{'vocab':>6}{'hidden':>10}{'lr':>7}{'epochs':>7}{'acc':>8}{'open acc':>9}{'bytes':>9}{'ms':>7}{'T':>5}{'nll':>7}{'final':>7}")
+
+    results = []
+    with worker_pool(workers, _init_worker, (threads,)) as pool:
+        for result in pool.imap_unordered(run_config, configs):
+            results.append(result)
+            config, calibration = result['config'], result['temperatures'][str(result['best_temperature'])]
+            print(f"{result['vocabulary_size']:>6}{'x'.join(map(str, config['hidden_sizes'])):>10}{config['learning_rate']:>7}{config['epochs']:>7}"
+                  f"{result['accuracy']:>8.2%}{result['opening_accuracy']:>9.2%}{result['model_bytes']:>9}{result['latency_ms']:>7.3f}"
+                  f"{result['best_temperature']:>5}{calibration['nll']:>7.3f}{calibration['final_rate']:>7.1%}")
+
+    best = select_best(results)
+    vectorizer = FEATURES[best['config']['max_features']][0]
+    model = SymptomClassifier.from_state_dict(best['state_dict'])
+    model.load_state_dict({name: torch.from_numpy(array) for name, array in best['state_dict'].items()})
+    # The serving temperature goes first: save_artifacts() compiles the question policy with it.
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, SERVING_CONFIG), 'w') as f:
+        json.dump({'temperature': best['best_temperature'], 'sweep_config': best['config']}, f, indent=2)
+    train_model.save_artifacts(output_dir, model, vectorizer, label_encoder, train_model.build_disease_symptom_map(base_df))
+    with open(os.path.join(output_dir, SWEEP_REPORT), 'w') as f:
+        json.dump({'best': best['config'], 'results': [{k: v for k, v in r.items() if k != 'state_dict'} for r in results]}, f, indent=2)
+    print(f"✅ Best: {best['config']} (accuracy {best['accuracy']:.2%}, opening accuracy {best['opening_accuracy']:.2%}, "
+          f"{best['model_bytes']} bytes, {best['latency_ms']:.3f} ms, temperature {best['best_temperature']}) written to {output_dir}/")
+    return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter and temperature sweep for SymptomClassifier.")
+    parser.add_argument('--csv', default=DATASET_CSV)
+    parser.add_argument('--output', default='sweep_artifacts', help="Where the best model's artifacts are written ('artifacts' to deploy them).")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--grid', help="JSON object overriding entries of the default grid.")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    grid = {**GRID, **json.loads(args.grid)} if args.grid else GRID
+    grid['hidden_sizes'] = [tuple(sizes) for sizes in grid['hidden_sizes']]
+    sweep(args.csv, args.output, grid, args.workers, args.seed)
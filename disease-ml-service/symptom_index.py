@@ -0,0 +1,120 @@
+import numpy as np
+
+
+class SymptomIndex:
+    """
+    Compact disease x symptom-phrase index built once from the disease-symptom map.
+    Phrase columns are stored in severity-ranked order (most severe first, ties by name),
+    so "pick the most severe candidate" is simply the first set bit of a row.
+    """
+    def __init__(self, disease_symptom_map, class_names, severity_levels):
+        all_phrases = {phrase for phrases in disease_symptom_map.values() for phrase in phrases}
+        self.phrases = sorted(all_phrases, key=lambda s: (-severity_levels.get(s, 0), s))
+        self.phrase_ids = {phrase: i for i, phrase in enumerate(self.phrases)}
+
+        # disease_mask[c, p] is True when class c lists phrase p.
+        self.disease_mask = np.zeros((len(class_names), len(self.phrases)), dtype=bool)
+        for class_index, disease in enumerate(class_names):
+            for phrase in disease_symptom_map.get(disease, []):
+                self.disease_mask[class_index, self.phrase_ids[phrase]] = True
+        # pair_diff[a, b] holds the symptoms that differentiate class a from class b.
+        self.pair_diff = self.disease_mask[:, None, :] ^ self.disease_mask[None, :, :]
+
+    def asked_row(self, state):
+        """Marks every phrase that was already confirmed or denied in one state."""
+        asked = np.zeros(len(self.phrases), dtype=bool)
+        for symptom in list(state['collected_symptoms'].keys()) + list(state['denied_symptoms']):
+            phrase_id = self.phrase_ids.get(symptom)
+            if phrase_id is not None: asked[phrase_id] = True
+        return asked
+
+    def asked_mask(self, states):
+        """Stacks one asked row per state, reusing a cached 'asked_row' when the state carries one."""
+        if not states: return np.zeros((0, len(self.phrases)), dtype=bool)
+        return np.stack([state['asked_row'] if 'asked_row' in state else self.asked_row(state) for state in states])
+
+    def _first_phrase(self, candidates):
+        first = candidates.argmax(axis=1)
+        found = candidates[np.arange(len(candidates)), first]
+        return first, found
+
+    def next_questions(self, top2_indices, asked):
+        """
+        Batched next-question selection. For each row, the most severe unasked symptom that
+        differentiates the top-2 classes, falling back to the top class's own unasked symptoms.
+        Returns one phrase (or None) per row.
+        """
+        if top2_indices.shape[1] < 2: return [None] * len(top2_indices)
+        first_class, second_class = top2_indices[:, 0], top2_indices[:, 1]
+        diff_choice, diff_found = self._first_phrase(self.pair_diff[first_class, second_class] & ~asked)
+        fallback_choice, fallback_found = self._first_phrase(self.disease_mask[first_class] & ~asked)
+        choices = np.where(diff_found, diff_choice, fallback_choice)
+        return [self.phrases[choice] if found else None
+                for choice, found in zip(choices.tolist(), (diff_found | fallback_found).tolist())]
+
+
+class HistoryIndex:
+    """
+    Medical-history conditions resolved once to symptom masks and classifier class indices,
+    so overlap scoring and the probability boost run as matrix operations over a batch.
+    Names are matched exactly as before: underscores become spaces, case is ignored.
+    """
+    def __init__(self, history_conditions, class_names):
+        self.conditions = list(history_conditions)
+        self.condition_ids = {condition: i for i, condition in enumerate(self.conditions)}
+        all_symptoms = {s.replace('_', ' ') for symptoms in history_conditions.values() for s in symptoms}
+        self.symptom_ids = {symptom: i for i, symptom in enumerate(sorted(all_symptoms))}
+
+        self.condition_mask = np.zeros((len(self.conditions), len(self.symptom_ids)), dtype=bool)
+        for condition_id, condition in enumerate(self.conditions):
+            for symptom in history_conditions[condition]:
+                self.condition_mask[condition_id, self.symptom_ids[symptom.replace('_', ' ')]] = True
+        self.condition_sizes = self.condition_mask.sum(axis=1)
+
+        # condition_to_class[c, k] is 1.0 when condition c names classifier class k.
+        class_ids = {name.replace('_', ' ').lower(): k for k, name in enumerate(class_names)}
+        self.condition_to_class = np.zeros((len(self.conditions), len(class_names)))
+        self.class_condition = np.full(len(class_names), -1)
+        for condition_id, condition in enumerate(self.conditions):
+            class_id = class_ids.get(condition.replace('_', ' ').lower())
+            if class_id is not None:
+                self.condition_to_class[condition_id, class_id] = 1.0
+                self.class_condition[class_id] = condition_id
+
+    def symptom_row(self, collected_symptoms):
+        """Marks the history-condition symptoms present among the collected symptom keys."""
+        collected = np.zeros(len(self.symptom_ids), dtype=bool)
+        for symptom in collected_symptoms:
+            symptom_id = self.symptom_ids.get(symptom)
+            if symptom_id is not None: collected[symptom_id] = True
+        return collected
+
+    def match(self, states):
+        """
+        Returns a (states x conditions) matrix of overlap scores, zero unless the condition is in
+        the user's history with >= 2 matching symptoms and >= 40% overlap, plus the per-state
+        {condition: score} dicts in the user's history order.
+        """
+        collected = np.zeros((len(states), len(self.symptom_ids)), dtype=bool)
+        requested = np.zeros((len(states), len(self.conditions)), dtype=bool)
+        for row, state in enumerate(states):
+            if not state['user_medical_history']: continue
+            for condition in state['user_medical_history']:
+                condition_id = self.condition_ids.get(condition)
+                if condition_id is not None: requested[row, condition_id] = True
+            collected[row] = state['history_row'] if 'history_row' in state else self.symptom_row(state['collected_symptoms'])
+
+        match_counts = collected.astype(np.int32) @ self.condition_mask.T.astype(np.int32)
+        match_percentage = match_counts / self.condition_sizes
+        scores = np.where(requested & (match_counts >= 2) & (match_percentage >= 0.4), match_percentage, 0.0)
+
+        all_history_matches = []
+        for row, state in enumerate(states):
+            history_matches = {}
+            if scores[row].any():
+                for condition in state['user_medical_history']:
+                    condition_id = self.condition_ids.get(condition)
+                    if condition_id is not None and scores[row, condition_id] > 0:
+                        history_matches[condition] = float(scores[row, condition_id])
+            all_history_matches.append(history_matches)
+        return scores, all_history_matches
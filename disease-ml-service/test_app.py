@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+import app as service
+from batching import MicroBatcher
+
+
+@pytest.fixture(scope='module')
+def client():
+    return service.app.test_client()
+
+
+def emergency_symptoms(client, text):
+    response = client.post('/normalize', json={'text': text})
+    assert response.status_code == 200
+    return response.get_json()['emergency_symptoms']
+
+
+# --- Emergency Detection ---
+@pytest.mark.parametrize('text, symptom', [
+    ('chest pains since morning', 'chest pain'), ('my chest hurts', 'chest pain'), ('he is having seizures', 'seizure'),
+    ('she had fits last night', 'seizure'), ('had a fit', 'seizure'), ('coughing blood', 'blood in sputum'),
+    ('it is hard to breathe', 'breathlessness'), ('I am bleeding a lot', 'severe bleeding'), ('he fainted', 'unconsciousness'),
+])
+def test_emergency_detected(client, text, symptom):
+    assert symptom in emergency_symptoms(client, text)
+
+
+@pytest.mark.parametrize('text', [
+    'otherwise I feel fit', 'I feel fit and well', 'mild headache and a runny nose', 'itchy skin rash', 'coughing a lot',
+])
+def test_no_false_emergency(client, text):
+    assert emergency_symptoms(client, text) == []
+
+
+# --- Session Answers ---
+@pytest.mark.parametrize('symptom_token', ['Skin_Rash', 'skin rash', 'throwing up'])
+def test_session_answer_matches_full_payload(client, symptom_token):
+    first = {'collected_symptoms': {'itching': 2}, 'denied_symptoms': [], 'question_counter': 1}
+    client.post('/predict', json={**first, 'session_id': f'answer-{symptom_token}'})
+    answer = {'symptom_token': symptom_token, 'has_symptom': True, 'severity': 3}
+    via_session = client.post('/predict', json={'session_id': f'answer-{symptom_token}', 'answer': answer}).get_json()
+    full = {'collected_symptoms': {'itching': 2, symptom_token: 3}, 'denied_symptoms': [], 'question_counter': 2}
+    assert via_session == client.post('/predict', json=full).get_json()
+
+
+# --- Compiled Policy ---
+def test_policy_table_matches_serving_logic(monkeypatch):
+    import triage
+    bundle = service.BUNDLE
+    assert bundle.policy_table # the committed table was compiled by this code
+    monkeypatch.setitem(triage.SEVERITY_LEVELS, 'itching', 5)
+    assert triage.load_policy(bundle.artifacts_dir, bundle.version, bundle.temperature, getattr(bundle.engine, 'precision', 'float32'),
+                              triage.policy_logic_hash(bundle.symptom_index)) == {}
+
+
+# --- Batch Validation ---
+def test_malformed_batch_state_fails_only_its_slot(client):
+    valid = {'collected_symptoms': {'itching': 2, 'skin rash': 3}}
+    states = [valid, 'not a state', {'collected_symptoms': ['itching']}, {'collected_symptoms': {'itching': 'severe'}},
+              {'collected_symptoms': {'itching': 2}, 'denied_symptoms': 'cough'}, {'collected_symptoms': {}}]
+    response = client.post('/predict/batch', json={'states': states})
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert results[0] == client.post('/predict', json=valid).get_json()
+    assert all(set(result) == {'error'} for result in results[1:])
+
+
+# --- Micro-batch Timeout ---
+def test_microbatch_timeout_is_rejected(client, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(service, 'PREDICT_BATCHER', MicroBatcher(lambda items: release.wait(5) and service.predict_batched_items(items)))
+    monkeypatch.setattr(service, 'MICROBATCH_TIMEOUT_S', 0.05)
+    rejected = service.METRICS.counters.get(('ml_rejected_total', (('reason', 'timeout'),)), 0)
+    response = client.post('/predict', json={'collected_symptoms': {'cough': 2, 'high fever': 3, 'headache': 1}, 'question_counter': 7})
+    release.set()
+    assert response.status_code == 503
+    assert service.METRICS.counters[('ml_rejected_total', (('reason', 'timeout'),))] == rejected + 1
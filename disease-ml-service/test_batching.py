@@ -0,0 +1,18 @@
+import threading
+
+from batching import MicroBatcher
+
+
+def test_cancelled_items_are_skipped():
+    release, processed = threading.Event(), []
+    def process_batch(items):
+        release.wait(5)
+        processed.extend(items)
+        return items
+    batcher = MicroBatcher(process_batch, max_batch_size=1, max_wait_ms=0)
+    first = batcher.submit('first') # occupies the worker until released
+    second = batcher.submit('second')
+    assert second.cancel()
+    release.set()
+    assert first.result(5) == 'first' and batcher.submit('third').result(5) == 'third'
+    assert processed == ['first', 'third'] and batcher.stats()['cancelled'] == 1
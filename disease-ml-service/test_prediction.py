@@ -200,4 +200,10 @@ def run_test_loop():
                 break
 
 if __name__ == '__main__':
-    run_test_loop()
\ No newline at end of file
+    # Headless by default: plays oracle-patient dialogues through the service's own predict logic
+    # (see simulate_dialogues.py for its options). --interactive keeps the manual terminal loop.
+    import sys
+    if '--interactive' in sys.argv: run_test_loop()
+    else:
+        import simulate_dialogues
+        simulate_dialogues.main(sys.argv[1:])
\ No newline at end of file
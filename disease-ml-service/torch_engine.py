@@ -0,0 +1,83 @@
+import json
+import os
+import joblib
+import numpy as np
+import torch
+import torch.nn as nn
+from model import SymptomClassifier
+from numpy_engine import PRECISION_REPORT, artifact_version
+
+# --- Reduced-precision modes ---
+# A mode other than float32 only activates if evaluate_precision.py has measured it on the
+# held-out split for these exact artifacts and it cleared the thresholds below, including
+# not being slower per request than float32 (the point of a reduced precision is speed or size).
+PRECISION_DTYPES = {'float32': torch.float32, 'float16': torch.float16, 'bfloat16': torch.bfloat16, 'int8': torch.float32}
+MIN_TOP1_AGREEMENT = 0.995
+MAX_FINAL_FLIP_RATE = 0.005
+MAX_LATENCY_RATIO = 1.0 # Mode latency / float32 latency, per single-row request
+
+
+def precision_gate(artifacts_dir, precision):
+    """Returns (allowed, reason) for serving the given precision with the artifacts in artifacts_dir."""
+    if precision == 'float32': return True, 'reference precision'
+    if precision not in PRECISION_DTYPES: return False, f"unknown precision '{precision}'"
+    try:
+        with open(os.path.join(artifacts_dir, PRECISION_REPORT), 'r') as f: report = json.load(f)
+    except FileNotFoundError:
+        return False, f"no {PRECISION_REPORT}; run evaluate_precision.py"
+    if report.get('artifact_version') != artifact_version(artifacts_dir):
+        return False, f"{PRECISION_REPORT} was produced for other artifacts"
+    metrics = report['modes'].get(precision)
+    if metrics is None: return False, f"'{precision}' was not evaluated"
+    if metrics['top1_agreement'] < MIN_TOP1_AGREEMENT or metrics['final_flip_rate'] > MAX_FINAL_FLIP_RATE:
+        return False, f"top-1 agreement {metrics['top1_agreement']:.2%}, is_final flips {metrics['final_flip_rate']:.2%}"
+    if metrics['latency_ms'] > report['float32']['latency_ms'] * MAX_LATENCY_RATIO:
+        return False, f"{metrics['latency_ms']:.3f} ms/request against {report['float32']['latency_ms']:.3f} ms for float32"
+    return True, 'passed evaluation'
+
+
+class TorchEngine:
+    """
+    Reference engine: the pickled sklearn vectorizer/encoder and the PyTorch SymptomClassifier.
+    Exposes the same interface as NumpyEngine, taking and returning numpy arrays.
+    """
+    name = 'torch'
+
+    def __init__(self, artifacts_dir='artifacts', device='cpu', precision='float32'):
+        self.device = torch.device(device)
+        self.precision = precision
+        self.input_dtype = PRECISION_DTYPES[precision]
+        encoder = joblib.load(os.path.join(artifacts_dir, 'label_encoder.pkl'))
+        self.vectorizer = joblib.load(os.path.join(artifacts_dir, 'tfidf_vectorizer.pkl'))
+        with open(os.path.join(artifacts_dir, 'disease_symptom_map.json'), 'r') as f: self.disease_symptom_map = json.load(f)
+        self.version = artifact_version(artifacts_dir)
+        self.vocabulary = self.vectorizer.vocabulary_
+        self.classes = np.asarray(encoder.classes_, dtype=object)
+        self.idf = self.vectorizer.idf_.tolist()
+        self.analyzer = self.vectorizer.build_analyzer()
+
+        # mmap + assign keeps the parameters backed by the weights file, so forked workers share its pages.
+        state_dict = torch.load(os.path.join(artifacts_dir, 'model_weights.pth'), map_location=self.device, mmap=True, weights_only=True)
+        self.model = SymptomClassifier.from_state_dict(state_dict).to(self.device)
+        self.model.load_state_dict(state_dict, assign=True)
+        self.model.eval()
+        if precision == 'int8':
+            self.model = torch.ao.quantization.quantize_dynamic(self.model, {nn.Linear}, dtype=torch.qint8)
+            # forward_bag gathers layer_1 weight columns, which needs them as floats: dequantize once here, not per request.
+            quantized = self.model.layer_1
+            self.model.layer_1 = nn.Linear(quantized.in_features, quantized.out_features)
+            self.model.layer_1.weight.data, self.model.layer_1.bias.data = quantized.weight().dequantize(), quantized.bias().detach()
+        elif precision != 'float32':
+            self.model = self.model.to(self.input_dtype)
+
+    def forward_bag(self, indices, offsets, weights):
+        with torch.no_grad():
+            return self.model.forward_bag(torch.from_numpy(indices).to(self.device), torch.from_numpy(offsets).to(self.device),
+                                          torch.from_numpy(weights).to(self.device, self.input_dtype)).float().cpu().numpy()
+
+    def forward_dense(self, X_matrix):
+        with torch.no_grad():
+            return self.model(torch.tensor(X_matrix, dtype=torch.float32).to(self.device, self.input_dtype)).float().cpu().numpy()
+
+    def transform_dense(self, texts):
+        return self.vectorizer.transform(texts).toarray()
@@ -1,16 +1,25 @@
+import argparse
+import hashlib
+import inspect
 import json
+import pickle
+import os
+import numpy as np
 import pandas as pd
 import re
 import joblib
+import scipy.sparse
+import sklearn
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from torch.utils.data import TensorDataset, DataLoader
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
 from sklearn.feature_extraction.text import TfidfVectorizer
-from datasets import load_dataset
 from model import SymptomClassifier # Import model blueprint
+from export_artifacts import export_bundle
+from compile_policy import compile_policy
+from triage import DATASET_CSV
 
 # --- Configuration ---
 DATASET_ID = "ares1123/disease_symtoms"
@@ -19,6 +28,12 @@ DISEASE_COL = "disease"
 EPOCHS = 20
 BATCH_SIZE = 32
 LEARNING_RATE = 0.001
+HIDDEN_SIZES = (128, 64)
+TEST_SIZE = 0.2
+SPLIT_SEED = 42
+TRAIN_SEED = 0 # Seeds weight init and minibatch order, so a retrain on the same data is bit-for-bit reproducible
+MAX_FEATURES = 2000
+FEATURE_CACHE_DIR = 'feature_cache'
 
 STOP_WORDS = set([
     'i', 'me', 'my', 'myself', 'we', 'our', 'ours', 'ourselves', 'you', 'your', 
@@ -54,18 +69,74 @@ def clean_symptoms(symptom_string):
 
 
 
-def train_and_save_model():
-    # 1. Load Data
+def load_raw_frame(csv_path=None):
+    """Loads the raw disease/symptom rows: the Hugging Face dataset, or a local CSV with the same columns."""
+    if csv_path:
+        print(f"Loading local dataset: {csv_path}...")
+        return pd.read_csv(csv_path)
+    from datasets import load_dataset # only needed (and network access only needed) without a local CSV
     print(f"Loading dataset: {DATASET_ID}...")
-    df = load_dataset(DATASET_ID)['train'].to_pandas()
+    return load_dataset(DATASET_ID)['train'].to_pandas()
+
+def feature_cache_key(df, max_features=MAX_FEATURES):
+    """Hash of the raw rows plus everything that shapes the features: cleaning code, stop words, TF-IDF config, sklearn version."""
+    digest = hashlib.sha256(pd.util.hash_pandas_object(df[[DISEASE_COL, SYMPTOMS_COL]], index=False).values.tobytes())
+    config = {'clean_symptoms': inspect.getsource(clean_symptoms), 'stop_words': sorted(STOP_WORDS),
+              'max_features': max_features, 'sklearn': sklearn.__version__}
+    digest.update(json.dumps(config, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def save_vectorizer(vectorizer, path):
+    """
+    Pickles the vectorizer so equal vectorizers give equal bytes, and so the same artifact_version, whether freshly
+    fitted or reloaded from the feature cache. joblib.dump does not: its array wrappers share strings with the
+    object by identity, which differs between the two. scikit-learn's per-process id(stop_words) cache is dropped
+    too (it only skips re-checking the stop words). joblib.load reads the plain pickle.
+    """
+    vars(vectorizer).pop('_stop_words_id', None)
+    with open(path, 'wb') as f: pickle.dump(vectorizer, f, protocol=4)
+
+def load_features(csv_path=None, max_features=MAX_FEATURES, cache_dir=FEATURE_CACHE_DIR):
+    """
+    Returns (df with Cleaned_Symptoms, fitted vectorizer, sparse float32 CSR TF-IDF matrix). The cleaned
+    text, the vectorizer and the matrix are cached under cache_dir/<feature_cache_key>; a re-run on
+    the same data and config reloads them instead of cleaning and fitting again.
+    """
+    df = load_raw_frame(csv_path)
+    entry = os.path.join(cache_dir, feature_cache_key(df, max_features)) if cache_dir else None
+    if entry and os.path.exists(os.path.join(entry, 'features_shape.json')):
+        print(f"Reusing cached features from {entry}")
+        with open(os.path.join(entry, 'cleaned_symptoms.json'), 'r') as f: df['Cleaned_Symptoms'] = json.load(f)
+        with open(os.path.join(entry, 'features_shape.json'), 'r') as f: shape = tuple(json.load(f))
+        # Read-only memory maps: processes that load the same entry (e.g. sweep workers) share one copy.
+        parts = [np.load(os.path.join(entry, f'features_{part}.npy'), mmap_mode='r') for part in ('data', 'indices', 'indptr')]
+        return df, joblib.load(os.path.join(entry, 'tfidf_vectorizer.pkl')), scipy.sparse.csr_matrix(tuple(parts), shape=shape, copy=False)
 
-    # 2. Preprocessing & Encoding
     print("Preprocessing data...")
     df['Cleaned_Symptoms'] = df[SYMPTOMS_COL].apply(clean_symptoms)
+    vectorizer = TfidfVectorizer(max_features=max_features)
+    X_sparse = vectorizer.fit_transform(df['Cleaned_Symptoms']).astype(np.float32).tocsr()
+    if entry:
+        os.makedirs(entry, exist_ok=True)
+        with open(os.path.join(entry, 'cleaned_symptoms.json'), 'w') as f: json.dump(df['Cleaned_Symptoms'].tolist(), f)
+        save_vectorizer(vectorizer, os.path.join(entry, 'tfidf_vectorizer.pkl'))
+        for part in ('data', 'indices', 'indptr'): np.save(os.path.join(entry, f'features_{part}.npy'), getattr(X_sparse, part))
+        with open(os.path.join(entry, 'features_shape.json'), 'w') as f: json.dump(X_sparse.shape, f) # written last: marks a complete entry
+    return df, vectorizer, X_sparse
 
+def split_indices(labels):
+    """Row indices of the train/held-out split. Evaluation scripts reuse it to score on the same held-out rows."""
+    return train_test_split(np.arange(len(labels)), test_size=TEST_SIZE, random_state=SPLIT_SEED, stratify=labels)
 
-     # --- FIX: Correctly generate the disease-symptom map ---
-    print("Creating disease-to-symptom map...")
+
+def csr_to_bags(X_batch):
+    """A CSR minibatch is already in EmbeddingBag form: column indices, row starts and values."""
+    return (torch.from_numpy(X_batch.indices.astype(np.int64)), torch.from_numpy(X_batch.indptr[:-1].astype(np.int64)),
+            torch.from_numpy(X_batch.data.astype(np.float32)))
+
+
+def build_disease_symptom_map(df):
+    # --- FIX: Correctly generate the disease-symptom map ---
     disease_symptom_map = {}
     # Group by disease and aggregate all unique symptoms for each
     for disease, group in df.groupby(DISEASE_COL):
@@ -83,63 +154,76 @@ def train_and_save_model():
                     all_symptoms_for_disease.add(cleaned_phrase)
 
         disease_symptom_map[disease] = sorted(list(all_symptoms_for_disease))
-    
-    # Save the map as a JSON artifact
-    with open('artifacts/disease_symptom_map.json', 'w') as f:
-        json.dump(disease_symptom_map, f, indent=2)
-    print("✅ Disease-symptom map saved correctly.")
     # --- END FIX ---
+    return disease_symptom_map
+
+def train_classifier(X_train, y_train, num_classes, hidden_sizes=HIDDEN_SIZES, epochs=EPOCHS, batch_size=BATCH_SIZE,
+                     learning_rate=LEARNING_RATE, seed=TRAIN_SEED):
+    """Trains on a sparse CSR matrix; minibatches go through forward_bag and are never densified."""
+    torch.manual_seed(seed)
+    generator = torch.Generator().manual_seed(seed)
+    y_train = torch.as_tensor(y_train, dtype=torch.long)
+    model = SymptomClassifier(X_train.shape[1], num_classes, *hidden_sizes)
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam(model.parameters(), lr=learning_rate)
+
+    for epoch in range(epochs):
+        order = torch.randperm(X_train.shape[0], generator=generator)
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            optimizer.zero_grad()
+            outputs = model.forward_bag(*csr_to_bags(X_train[batch.numpy()]))
+            loss = criterion(outputs, y_train[batch])
+            loss.backward()
+            optimizer.step()
+    return model.eval()
+
+def save_artifacts(artifacts_dir, model, vectorizer, label_encoder, disease_symptom_map):
+    os.makedirs(artifacts_dir, exist_ok=True)
+    with open(os.path.join(artifacts_dir, 'disease_symptom_map.json'), 'w') as f:
+        json.dump(disease_symptom_map, f, indent=2)
+    torch.save(model.state_dict(), os.path.join(artifacts_dir, 'model_weights.pth'))
+    save_vectorizer(vectorizer, os.path.join(artifacts_dir, 'tfidf_vectorizer.pkl'))
+    joblib.dump(label_encoder, os.path.join(artifacts_dir, 'label_encoder.pkl'))
+    # The NumPy serving bundle must always be regenerated together with the artifacts above.
+    export_bundle(artifacts_dir)
+    # So must the compiled question policy, which is only served for the artifact version it was compiled from.
+    compile_policy(artifacts_dir)
+
+
+def train_and_save_model(csv_path=None, artifacts_dir='artifacts', cache_dir=FEATURE_CACHE_DIR):
+    # 1. Load Data
+    # 2. Preprocessing & Encoding (TF-IDF stays sparse; cached on disk across runs)
+    df, vectorizer, X_sparse = load_features(csv_path, cache_dir=cache_dir)
+    print("Creating disease-to-symptom map...")
+    disease_symptom_map = build_disease_symptom_map(df)
 
     # Label Encoder (Disease -> Number)
     label_encoder = LabelEncoder()
-    df['Label'] = label_encoder.fit_transform(df[DISEASE_COL])
+    y = label_encoder.fit_transform(df[DISEASE_COL])
     num_classes = len(label_encoder.classes_)
-
-    # TfidfVectorizer (Symptoms -> BoW Vector)
-    vectorizer = TfidfVectorizer(max_features=2000)
-    X_sparse = vectorizer.fit_transform(df['Cleaned_Symptoms']).toarray()
-    y = df['Label'].values
+    print(f"BoW Vector Size (Input Size): {X_sparse.shape[1]}")
     
-    input_size = X_sparse.shape[1]
-    print(f"BoW Vector Size (Input Size): {input_size}")
-    
-    # 3. Data Split & PyTorch Setup
-    X_train, _, y_train, _ = train_test_split(
-        X_sparse, y, test_size=0.2, random_state=42, stratify=y
-    )
-    X_train_tensor = torch.tensor(X_train, dtype=torch.float32)
-    y_train_tensor = torch.tensor(y_train, dtype=torch.long)
-    
-    train_data = TensorDataset(X_train_tensor, y_train_tensor)
-    train_loader = DataLoader(train_data, batch_size=BATCH_SIZE, shuffle=True)
+    # 3. Data Split
+    train_indices, test_indices = split_indices(y)
 
     # 4. Model Training
     print("Starting model training...")
-    model = SymptomClassifier(input_size, num_classes)
-    criterion = nn.CrossEntropyLoss()
-    optimizer = optim.Adam(model.parameters(), lr=LEARNING_RATE)
-
-    for epoch in range(EPOCHS):
-        for inputs, labels in train_loader:
-            optimizer.zero_grad()
-            outputs = model(inputs)
-            loss = criterion(outputs, labels)
-            loss.backward()
-            optimizer.step()
-
-    print("Training complete.")
+    model = train_classifier(X_sparse[train_indices], y[train_indices], num_classes)
+    with torch.no_grad():
+        predicted = model.forward_bag(*csr_to_bags(X_sparse[test_indices])).argmax(dim=1).numpy()
+    print(f"Training complete. Held-out accuracy: {(predicted == y[test_indices]).mean():.2%}")
 
     # 5. Save Artifacts
-    print("Saving model and preprocessors to artifacts/...")
-    import os
-    os.makedirs('artifacts', exist_ok=True)
-    
-    torch.save(model.state_dict(), 'artifacts/model_weights.pth')
-    joblib.dump(vectorizer, 'artifacts/tfidf_vectorizer.pkl')
-    joblib.dump(label_encoder, 'artifacts/label_encoder.pkl')
-    
+    print(f"Saving model and preprocessors to {artifacts_dir}/...")
+    save_artifacts(artifacts_dir, model, vectorizer, label_encoder, disease_symptom_map)
     print("All artifacts saved successfully!")
 
 
 if __name__ == '__main__':
-    train_and_save_model()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train SymptomClassifier and write the serving artifacts.")
+    parser.add_argument('--csv', nargs='?', const=DATASET_CSV, help=f"Train offline from a local CSV (default {DATASET_CSV}) instead of Hugging Face.")
+    parser.add_argument('--artifacts', default='artifacts')
+    parser.add_argument('--no-cache', action='store_true', help="Recompute cleaned text and TF-IDF features instead of using the feature cache.")
+    args = parser.parse_args()
+    train_and_save_model(args.csv, args.artifacts, None if args.no_cache else FEATURE_CACHE_DIR)
\ No newline at end of file
@@ -0,0 +1,471 @@
+import gzip
+import hashlib
+import inspect
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+import numpy as np
+from typing import NamedTuple
+from numpy_engine import BUNDLE_FILE, SOURCE_FILES, NumpyEngine, artifact_version, softmax
+from symptom_index import SymptomIndex, HistoryIndex
+from metrics import Metrics
+from phrase_matcher import PhraseMatcher
+
+# --- Configuration ---
+# 'torch' serves through the reference SymptomClassifier and the pickled sklearn objects;
+# 'numpy' serves from artifacts/model_bundle.bin (see export_artifacts.py) without importing torch or sklearn.
+ENGINE_NAME = os.environ.get('ML_ENGINE', 'torch')
+PRECISION = os.environ.get('ML_PRECISION', 'float32') # torch engine only: float32, int8, float16 or bfloat16
+QUESTION_STRATEGY = os.environ.get('ML_QUESTION_STRATEGY', 'severity') # 'severity' or 'info_gain'; overridable per request
+INFO_GAIN_TOP_K = 5
+HYPOTHETICAL_SEVERITY = 3 # Severity assumed for a hypothetical "yes" answer (the backend's default)
+SPARSE_INPUT = os.environ.get('ML_SPARSE_INPUT', '1') == '1' # '0' falls back to the dense TF-IDF reference path
+DEFAULT_TEMPERATURE = 2.0 # overridden per release by serving_config.json when a sweep (sweep.py) tuned it
+SERVING_CONFIG = 'serving_config.json'
+POLICY_FILE = 'policy_table.json.gz' # written by compile_policy.py
+DATASET_CSV = 'disease_sympts_prec_full.csv' # bundled copy of the dataset, the offline tools' default --csv
+
+
+# --- Instrumentation (per-stage latency histograms and counters on /metrics; ML_METRICS=0 makes it all a no-op) ---
+METRICS = Metrics(os.environ.get('ML_METRICS', '1') == '1')
+
+
+# --- Medical History Data ---
+CHRONIC_DISEASES = {
+    "Hypertension": ["headache", "chest_pain", "dizziness", "loss_of_balance", "lack_of_concentration"],
+    "Migraine": ["acidity", "indigestion", "headache", "blurred_and_distorted_vision", "excessive_hunger", "stiff_neck", "depression", "irritability", "visual_disturbances"],
+    "Cervical spondylosis": ["back_pain", "weakness_in_limbs", "neck_pain", "dizziness", "loss_of_balance"],
+    "Diabetes": ["fatigue", "weight_loss", "restlessness", "lethargy", "irregular_sugar_level", "blurred_and_distorted_vision", "obesity", "excessive_hunger", "increased_appetite", "polyuria"],
+    "Arthritis": ["muscle_weakness", "stiff_neck", "swelling_joints", "movement_stiffness", "spinning_movements", "loss_of_balance", "unsteadiness", "weakness_of_one_body_side"],
+    "Chronic cholestasis": ["itching", "vomiting", "yellowish_skin", "nausea", "loss_of_appetite", "abdominal_pain", "yellowing_of_eyes"],
+    "Heart attack": ["vomiting", "breathlessness", "sweating", "chest_pain"],
+    "Bronchial Asthma": ["fatigue", "cough", "high_fever", "breathlessness", "family_history", "mucoid_sputum"],
+    "GERD": ["stomach_pain", "acidity", "ulcers_on_tongue", "vomiting", "cough", "chest_pain"],
+    "Peptic ulcer diseae": ["vomiting", "loss_of_appetite", "abdominal_pain", "passage_of_gases", "internal_itching"],
+    "Osteoarthristis": ["joint_pain", "neck_pain", "knee_pain", "hip_joint_pain", "swelling_joints", "painful_walking"],
+    "Hypothyroidism": ["fatigue", "weight_gain", "cold_hands_and_feets", "mood_swings", "lethargy", "dizziness", "puffy_face_and_eyes", "enlarged_thyroid", "brittle_nails", "swollen_extremeties", "depression", "irritability", "abnormal_menstruation"],
+    "Hyperthyroidism": ["fatigue", "mood_swings", "weight_loss", "restlessness", "sweating", "diarrhoea", "fast_heart_rate", "excessive_hunger", "muscle_weakness", "irritability", "abnormal_menstruation"],
+    "Hypoglycemia": ["vomiting", "fatigue", "anxiety", "sweating", "headache", "nausea", "blurred_and_distorted_vision", "excessive_hunger", "drying_and_tingling_lips", "slurred_speech", "irritability", "palpitations"],
+    "Psoriasis": ["skin_rash", "joint_pain", "skin_peeling", "silver_like_dusting", "small_dents_in_nails", "inflammatory_nails"],
+    "Varicose veins": ["fatigue", "cramps", "bruising", "obesity", "swollen_legs", "swollen_blood_vessels", "prominent_veins_on_calf"],
+    "Paralysis (brain hemorrhage)": ["vomiting", "headache", "weakness_of_one_body_side", "altered_sensorium"]
+}
+GENETIC_DISEASES = {
+    "Hemochromatosis": ["joint_pain", "vomiting", "fatigue", "high_fever", "loss_of_appetite", "abdominal_pain", "yellowing_of_eyes"],
+    "Thalassemia": ["fatigue", "weight_loss", "breathlessness", "yellowish_skin", "dark_urine", "loss_of_appetite", "abdominal_pain", "yellowing_of_eyes", "enlarged_spleen"],
+    "Sickle cell anemia": ["joint_pain", "vomiting", "fatigue", "high_fever", "breathlessness", "swelling_joints", "pain_in_bones", "chest_pain", "swelling_extremeties"],
+    "Cystic fibrosis": ["fatigue", "cough", "high_fever", "breathlessness", "mucoid_sputum", "rusty_sputum", "salty_taste_in_mouth", "weight_loss", "family_history"],
+}
+SEVERITY_LEVELS = {
+    'chest_pain': 5, 'breathlessness': 5, 'heart_attack': 5, 'paralysis_(brain_hemorrhage)': 5, 'coma': 5, 'blood_in_sputum': 5, 'acute_liver_failure': 5, 'altered_sensorium': 5,
+    'fast_heart_rate': 4, 'high_fever': 3, 'loss_of_balance': 3, 'unsteadiness': 3, 'weakness_of_one_body_side': 3, 'pain_behind_the_eyes': 3, 'dehydration': 3, 'vomiting': 3, 'chills': 3, 'joint_pain': 3, 'abdominal_pain': 3, 'diarrhoea': 3, 'yellowish_skin': 3, 'dark_urine': 3, 'swelling_joints': 3, 'painful_walking': 3, 'dizziness': 3, 'stiff_neck': 3, 'blurred_and_distorted_vision': 3, 'constipation': 3, 'sweating': 3,
+    'fatigue': 2, 'headache': 2, 'nausea': 2, 'cough': 2, 'skin_rash': 2, 'muscle_pain': 2, 'lethargy': 2, 'weight_loss': 2, 'loss_of_appetite': 2, 'restlessness': 2, 'mood_swings': 2,
+    'itching': 1, 'continuous_sneezing': 1, 'runny_nose': 1, 'acidity': 1, 'indigestion': 1
+}
+
+
+# --- Symptom Vocabulary ---
+# Everyday wording -> canonical symptom phrase. Entries whose target the loaded model does not know are skipped.
+SYMPTOM_SYNONYMS = {
+    'throwing up': 'vomiting', 'puking': 'vomiting', 'vomit': 'vomiting', 'feeling sick': 'nausea', 'nauseous': 'nausea',
+    'shortness of breath': 'breathlessness', 'short of breath': 'breathlessness', 'breathless': 'breathlessness',
+    'difficulty breathing': 'breathlessness', 'trouble breathing': 'breathlessness', 'cannot breathe': 'breathlessness', "can't breathe": 'breathlessness',
+    'hard to breathe': 'breathlessness', 'chest ache': 'chest pain', 'chest tightness': 'chest pain', 'chest hurts': 'chest pain',
+    'coughing up blood': 'blood in sputum', 'coughing blood': 'blood in sputum',
+    'tired': 'fatigue', 'tiredness': 'fatigue', 'exhausted': 'fatigue', 'exhaustion': 'fatigue',
+    'head ache': 'headache', 'head pain': 'headache', 'dizzy': 'dizziness', 'lightheaded': 'dizziness', 'vertigo': 'spinning movements',
+    'loose motions': 'diarrhoea', 'diarrhea': 'diarrhoea', 'loose stools': 'diarrhoea', 'tummy ache': 'stomach pain', 'stomach ache': 'stomach pain',
+    'stomachache': 'stomach pain', 'belly ache': 'belly pain', 'heartburn': 'acidity', 'acid reflux': 'acidity', 'gas': 'passage of gases', 'bloating': 'distention of abdomen',
+    'high temperature': 'high fever', 'feverish': 'mild fever', 'low grade fever': 'mild fever', 'shivers': 'shivering', 'sweats': 'sweating', 'night sweats': 'sweating',
+    'itchy': 'itching', 'itchy skin': 'itching', 'rash': 'skin rash', 'sneezing': 'continuous sneezing', 'blocked nose': 'congestion', 'stuffy nose': 'congestion',
+    'sore throat': 'throat irritation', 'scratchy throat': 'throat irritation', 'jaundice': 'yellowish skin', 'yellow skin': 'yellowish skin', 'yellow eyes': 'yellowing of eyes',
+    'blurry vision': 'blurred and distorted vision', 'blurred vision': 'blurred and distorted vision', 'racing heart': 'fast heart rate', 'heart racing': 'fast heart rate',
+    'rapid heartbeat': 'fast heart rate', 'pounding heart': 'palpitations', 'joint ache': 'joint pain', 'achy joints': 'joint pain', 'body ache': 'muscle pain',
+    'muscle ache': 'muscle pain', 'sore muscles': 'muscle pain', 'stiff joints': 'movement stiffness', 'not hungry': 'loss of appetite', 'no appetite': 'loss of appetite',
+    'peeing a lot': 'polyuria', 'frequent urination': 'polyuria', 'burning urination': 'burning micturition', 'painful urination': 'burning micturition',
+    'losing weight': 'weight loss', 'gaining weight': 'weight gain', 'anxious': 'anxiety', 'depressed': 'depression', 'confusion': 'altered sensorium',
+    'unconscious': 'unconsciousness', 'passed out': 'unconsciousness', 'fainted': 'unconsciousness', 'fits': 'seizure', 'had a fit': 'seizure',
+    'having a fit': 'seizure', 'convulsion': 'seizure', 'convulsions': 'seizure',
+    'brain hemorrhage': 'paralysis', 'heart failure': 'cardiac arrest', 'bleeding heavily': 'severe bleeding',
+    'bleeding a lot': 'severe bleeding',
+}
+# Canonical symptoms that send a session straight to emergency care (mirrored by the backend's CANONICAL_EMERGENCY_SYMPTOMS).
+EMERGENCY_SYMPTOMS = ['chest pain', 'breathlessness', 'blood in sputum', 'altered sensorium', 'coma', 'heart attack', 'cardiac arrest',
+                      'paralysis', 'stroke', 'seizure', 'unconsciousness', 'severe bleeding']
+
+
+# --- Logic Functions ---
+def load_engine(engine_name, precision='float32', artifacts_dir='artifacts'):
+    if engine_name == 'numpy':
+        engine = NumpyEngine(artifacts_dir)
+        # Next to its source files the bundle must have been exported from them; a retrain writes it last.
+        if all(os.path.exists(os.path.join(artifacts_dir, name)) for name in SOURCE_FILES) and engine.version != artifact_version(artifacts_dir):
+            raise ValueError(f"{BUNDLE_FILE} is for artifacts {engine.version}, the source files are {artifact_version(artifacts_dir)}; rerun export_artifacts.py")
+        return engine
+    from torch_engine import TorchEngine, precision_gate # imported lazily so the numpy engine never loads torch
+    allowed, reason = precision_gate(artifacts_dir, precision)
+    if not allowed:
+        print(f"⚠️ Refusing {precision} precision ({reason}); serving float32.")
+        precision = 'float32'
+    return TorchEngine(artifacts_dir, precision=precision)
+
+
+def load_serving_temperature(artifacts_dir='artifacts'):
+    try:
+        with open(os.path.join(artifacts_dir, SERVING_CONFIG), 'r') as f: return float(json.load(f)['temperature'])
+    except FileNotFoundError:
+        return DEFAULT_TEMPERATURE
+
+
+def policy_logic_hash(symptom_index):
+    """Hash of the code and tables a compiled policy response depends on besides the artifacts themselves."""
+    tables = [SEVERITY_LEVELS, CHRONIC_DISEASES, GENETIC_DISEASES, symptom_index.phrases, INFO_GAIN_TOP_K, HYPOTHETICAL_SEVERITY]
+    sources = [inspect.getsource(function) for function in (reached_confidence, apply_history_boost, info_gain_questions, predict_states)]
+    return hashlib.sha256(json.dumps([tables, sources], sort_keys=True).encode()).hexdigest()[:12]
+
+
+def load_policy(artifacts_dir, version, temperature, precision, logic_hash):
+    """
+    The compiled table as {result cache key: response JSON text}, or {} when there is none or it was
+    compiled from other artifacts, another temperature, another precision or other triage logic (it is
+    then stale, not just slower). Responses stay serialized and symptom names are interned, a third of
+    the memory of dicts.
+    """
+    try:
+        with gzip.open(os.path.join(artifacts_dir, POLICY_FILE), 'rt') as f: policy = json.load(f)
+    except FileNotFoundError:
+        return {}
+    compiled_for = (policy['artifact_version'], policy['temperature'], policy['precision'], policy.get('logic_hash'))
+    if compiled_for != (version, temperature, precision, logic_hash):
+        print(f"⚠️ Ignoring {POLICY_FILE}: compiled for {compiled_for}, serving {(version, temperature, precision, logic_hash)}. Rerun compile_policy.py.")
+        return {}
+    return {(tuple((sys.intern(symptom), severity) for symptom, severity in collected), tuple(map(sys.intern, denied)), answered,
+             tuple(history), strategy): response for (collected, denied, answered, history, strategy), response in policy['entries']}
+
+
+class ServingBundle(NamedTuple):
+    """Everything one artifact version needs to serve. Requests read a single reference, so a swap is atomic."""
+    version: str
+    artifacts_dir: str
+    engine: object
+    class_ids: dict # class name -> index into engine.classes
+    disease_symptom_map: dict
+    symptom_index: SymptomIndex
+    history_index: HistoryIndex
+    phrase_matcher: PhraseMatcher
+    emergency_ids: frozenset
+    policy_table: dict # result cache key -> response, precompiled by compile_policy.py for common dialogue paths
+    temperature: float
+    loaded_at: float
+
+
+def build_phrase_matcher(symptom_index, vocabulary):
+    """
+    Canonical tokens are the model's symptom phrases (ids equal to SymptomIndex phrase ids), then the
+    emergency symptoms it does not list, then vocabulary terms, which keep the TF-IDF signal of words
+    that are not part of any recognised phrase. Synonyms of emergency symptoms match only as written,
+    so stemming cannot turn everyday words into an emergency ("I feel fit" is not "fits").
+    """
+    canonical = set(symptom_index.phrases) | set(EMERGENCY_SYMPTOMS)
+    entries = [(phrase, phrase) for phrase in symptom_index.phrases]
+    entries += [(synonym, target) for synonym, target in SYMPTOM_SYNONYMS.items() if target in canonical]
+    entries += [(symptom, symptom) for symptom in EMERGENCY_SYMPTOMS]
+    entries += [(term, term) for term in sorted(vocabulary)]
+    return PhraseMatcher(entries, {synonym for synonym, target in SYMPTOM_SYNONYMS.items() if target in EMERGENCY_SYMPTOMS})
+
+
+def build_bundle(artifacts_dir):
+    engine = load_engine(ENGINE_NAME, PRECISION, artifacts_dir)
+    symptom_index = SymptomIndex(engine.disease_symptom_map, engine.classes, SEVERITY_LEVELS)
+    phrase_matcher = build_phrase_matcher(symptom_index, engine.vocabulary)
+    temperature = load_serving_temperature(artifacts_dir)
+    return ServingBundle(engine.version, artifacts_dir, engine, {name: i for i, name in enumerate(engine.classes.tolist())},
+                         engine.disease_symptom_map, symptom_index,
+                         HistoryIndex({**CHRONIC_DISEASES, **GENETIC_DISEASES}, engine.classes), phrase_matcher,
+                         frozenset(phrase_matcher.token_ids[symptom] for symptom in EMERGENCY_SYMPTOMS),
+                         load_policy(artifacts_dir, engine.version, temperature, getattr(engine, 'precision', 'float32'), policy_logic_hash(symptom_index)),
+                         temperature, time.time())
+
+
+def state_error(data):
+    """Why a raw triage state cannot be scored, or None when its fields have the expected types."""
+    if not isinstance(data, dict): return 'State must be a JSON object.'
+    collected_symptoms = data.get('collected_symptoms', {})
+    if not isinstance(collected_symptoms, dict) or not all(isinstance(severity, (int, float)) and not isinstance(severity, bool)
+                                                          for severity in collected_symptoms.values()):
+        return "'collected_symptoms' must map symptom names to numeric severities."
+    for field in ('denied_symptoms', 'user_medical_history'):
+        if not isinstance(data.get(field, []), list) or not all(isinstance(item, str) for item in data.get(field, [])):
+            return f"'{field}' must be a list of strings."
+    question_counter = data.get('question_counter', 0)
+    if not isinstance(question_counter, int) or isinstance(question_counter, bool): return "'question_counter' must be an integer."
+    if not isinstance(data.get('question_strategy', QUESTION_STRATEGY), str): return "'question_strategy' must be a string."
+    return None
+
+
+def parse_state(data):
+    return {
+        'collected_symptoms': data.get('collected_symptoms', {}),
+        'denied_symptoms': data.get('denied_symptoms', []),
+        'question_counter': data.get('question_counter', 0),
+        'user_medical_history': data.get('user_medical_history', []), # Expects a list of strings
+        'question_strategy': data.get('question_strategy', QUESTION_STRATEGY),
+    }
+
+
+def canonicalize_state(state, bundle):
+    """
+    Rewrites free-text symptom keys to canonical tokens ("Skin_Rash", "throwing up and chest ache" ->
+    "skin rash", "vomiting", "chest pain"); canonical keys pass through on a dict lookup. Keys that
+    mention nothing known are kept as sent. Repeated mentions keep the highest severity.
+    """
+    matcher = bundle.phrase_matcher
+    collected_symptoms = {}
+    for symptom, severity in state['collected_symptoms'].items():
+        for token in matcher.canonical(symptom) or [symptom]:
+            collected_symptoms[token] = max(severity, collected_symptoms.get(token, severity))
+    denied_symptoms = [token for symptom in state['denied_symptoms'] for token in matcher.canonical(symptom) or [symptom]]
+    return {**state, 'collected_symptoms': collected_symptoms, 'denied_symptoms': list(dict.fromkeys(denied_symptoms))}
+
+
+# --- Session state (cached per session_id and updated incrementally per answer) ---
+def prime_session_state(state, bundle):
+    """Attaches the derived pieces that add_symptom()/apply_answer() keep up to date turn by turn."""
+    state['term_counts'] = term_counts(state['collected_symptoms'].keys(), bundle)
+    state['asked_row'] = bundle.symptom_index.asked_row(state)
+    state['history_row'] = bundle.history_index.symptom_row(state['collected_symptoms'])
+    return state
+
+
+def add_symptom(state, symptom, severity, bundle):
+    """Returns a copy of the state with the symptom confirmed; cached session pieces are updated, not recomputed."""
+    new_state = {**state, 'collected_symptoms': {**state['collected_symptoms'], symptom: severity}}
+    if symptom in state['collected_symptoms']: return new_state
+    if 'term_counts' in state:
+        counts = dict(state['term_counts'])
+        for index, count in term_counts([symptom], bundle).items(): counts[index] = counts.get(index, 0) + count
+        new_state['term_counts'] = counts
+    if 'asked_row' in state:
+        new_state['asked_row'] = state['asked_row'].copy()
+        phrase_id = bundle.symptom_index.phrase_ids.get(symptom)
+        if phrase_id is not None: new_state['asked_row'][phrase_id] = True
+    if 'history_row' in state:
+        new_state['history_row'] = state['history_row'] | bundle.history_index.symptom_row([symptom])
+    return new_state
+
+
+def valid_answer(answer):
+    if not isinstance(answer, dict) or not isinstance(answer.get('symptom_token'), str) or not answer['symptom_token']: return False
+    severity = answer.get('severity')
+    return severity is None or (isinstance(severity, (int, float)) and not isinstance(severity, bool))
+
+
+def apply_answer(state, answer, bundle):
+    """
+    Applies one /continue-style answer ({symptom_token, has_symptom, severity}) to a cached session state.
+    The token is canonicalized the way canonicalize_state() does it for a full payload ("Skin_Rash" -> "skin rash").
+    """
+    tokens = bundle.phrase_matcher.canonical(answer['symptom_token']) or [answer['symptom_token']]
+    already_asked = all(token in state['collected_symptoms'] or token in state['denied_symptoms'] for token in tokens)
+    new_state = state
+    for token in tokens: new_state = apply_token(new_state, token, answer, bundle)
+    if not already_asked: new_state['question_counter'] = state['question_counter'] + 1
+    return new_state
+
+
+def apply_token(state, token, answer, bundle):
+    if answer.get('has_symptom'):
+        new_state = add_symptom(state, token, answer.get('severity') or HYPOTHETICAL_SEVERITY, bundle)
+        new_state['denied_symptoms'] = [s for s in state['denied_symptoms'] if s != token]
+    elif token in state['collected_symptoms']:
+        # Retracting a confirmed symptom is rare; rebuild instead of decrementing.
+        collected_symptoms = {s: v for s, v in state['collected_symptoms'].items() if s != token}
+        new_state = prime_session_state({**state, 'collected_symptoms': collected_symptoms, 'denied_symptoms': state['denied_symptoms'] + [token]}, bundle)
+    else:
+        new_state = {**state, 'denied_symptoms': list(dict.fromkeys(state['denied_symptoms'] + [token])), 'asked_row': state['asked_row'].copy()}
+        phrase_id = bundle.symptom_index.phrase_ids.get(token)
+        if phrase_id is not None: new_state['asked_row'][phrase_id] = True
+    return new_state
+
+
+def vectorize_states(states, bundle):
+    """Stacks every state into one TF-IDF matrix, one row per state, with severity rescaling applied."""
+    with METRICS.stage('tfidf_transform'):
+        X_matrix = bundle.engine.transform_dense([" ".join(state['collected_symptoms'].keys()) for state in states])
+    with METRICS.stage('severity_rescale'):
+        for row, state in enumerate(states):
+            for symptom, severity in state['collected_symptoms'].items():
+                if symptom in bundle.engine.vocabulary:
+                    X_matrix[row, bundle.engine.vocabulary[symptom]] *= (1 + (severity - 1) * 0.5)
+    return X_matrix
+
+
+def term_counts(symptoms, bundle):
+    """Counts in-vocabulary tokens of the given symptom keys. Counts of separate keys simply add up."""
+    counts = {}
+    for token in bundle.engine.analyzer(" ".join(symptoms)):
+        index = bundle.engine.vocabulary.get(token)
+        if index is not None: counts[index] = counts.get(index, 0) + 1
+    return counts
+
+
+def encode_states(states, bundle):
+    """
+    Sparse equivalent of vectorize_states(): maps tokens straight to vocabulary indices and
+    l2-normalised TF-IDF weights (with severity rescaling), returned as EmbeddingBag inputs.
+    """
+    indices, offsets, weights = [], [], []
+    for state in states:
+        collected_symptoms = state['collected_symptoms']
+        counts = state['term_counts'] if 'term_counts' in state else term_counts(collected_symptoms.keys(), bundle)
+        row_weights = {index: count * bundle.engine.idf[index] for index, count in counts.items()}
+        norm = math.sqrt(sum(w * w for w in row_weights.values()))
+        if norm > 0: row_weights = {index: w / norm for index, w in row_weights.items()}
+        for symptom, severity in collected_symptoms.items():
+            index = bundle.engine.vocabulary.get(symptom)
+            if index in row_weights: row_weights[index] *= (1 + (severity - 1) * 0.5)
+        offsets.append(len(indices))
+        for index in sorted(row_weights): # fixed order keeps the float sum independent of how the row was built
+            indices.append(index)
+            weights.append(row_weights[index])
+    return np.asarray(indices, dtype=np.int64), np.asarray(offsets, dtype=np.int64), np.asarray(weights, dtype=np.float32)
+
+
+def forward_states(states, bundle):
+    """Runs the classifier over all states and returns temperature-scaled softmax probabilities."""
+    with METRICS.stage('encode'):
+        inputs = encode_states(states, bundle) if SPARSE_INPUT else vectorize_states(states, bundle)
+    with METRICS.stage('forward'):
+        logits = bundle.engine.forward_bag(*inputs) if SPARSE_INPUT else bundle.engine.forward_dense(inputs)
+        return softmax(logits / bundle.temperature)
+
+
+def apply_history_boost(probabilities, states, bundle):
+    """Boosts each class named by a matched history condition by 15% x overlap, then renormalises the affected rows."""
+    scores, all_history_matches = bundle.history_index.match(states)
+    boosted_rows = np.flatnonzero(scores.any(axis=1))
+    if len(boosted_rows):
+        class_scores = scores[boosted_rows] @ bundle.history_index.condition_to_class
+        boosted = probabilities[boosted_rows].astype(np.float64)
+        boosted = boosted + boosted * 0.15 * class_scores
+        probabilities[boosted_rows] = (boosted / boosted.sum(axis=1, keepdims=True)).astype(np.float32)
+    return probabilities, all_history_matches
+
+
+def entropy(probabilities):
+    """Row-wise Shannon entropy (nats) of probability rows, 0 * log 0 taken as 0; scipy.stats costs ~1 s of import."""
+    probabilities = probabilities / probabilities.sum(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = np.where(probabilities > 0, -probabilities * np.log(probabilities), 0)
+    return terms.sum(axis=1)
+
+
+def reached_confidence(top_confidence, question_counter):
+    # Decide whether we have enough confidence to stop asking questions.
+    # Removed the hard limit of 7 questions so the flow is
+    # driven purely by confidence and available distinguishing symptoms.
+    return top_confidence >= (98.0 if question_counter == 0 else 85.0) and question_counter > 0
+
+
+def info_gain_questions(probabilities, top_indices, states, asked, bundle):
+    """
+    Opt-in selector: scores every unasked symptom of the top-k classes by expected entropy
+    reduction, using one batched forward pass over all hypothetical "yes" answers.
+    A "no" answer only extends denied_symptoms, which the model never sees, so the "no"
+    outcome keeps the current distribution and the gain is P(yes) * (H(now) - H(yes)).
+    """
+    candidate_lists, hypothetical_states = [], []
+    for row, state in enumerate(states):
+        top_classes = top_indices[row, :INFO_GAIN_TOP_K]
+        candidates = np.flatnonzero(bundle.symptom_index.disease_mask[top_classes].any(axis=0) & ~asked[row])
+        candidate_lists.append(candidates)
+        for phrase_id in candidates.tolist():
+            hypothetical_states.append(add_symptom(state, bundle.symptom_index.phrases[phrase_id], HYPOTHETICAL_SEVERITY, bundle))
+    if not hypothetical_states: return [None] * len(states)
+
+    yes_probabilities, _ = apply_history_boost(forward_states(hypothetical_states, bundle), hypothetical_states, bundle)
+    yes_entropy = entropy(yes_probabilities)
+    current_entropy = entropy(probabilities)
+    choices, offset = [], 0
+    for row, candidates in enumerate(candidate_lists):
+        if not len(candidates):
+            choices.append(None)
+            continue
+        top_classes = top_indices[row, :INFO_GAIN_TOP_K]
+        class_weights = probabilities[row, top_classes] / probabilities[row, top_classes].sum()
+        p_yes = class_weights @ bundle.symptom_index.disease_mask[top_classes][:, candidates]
+        gain = p_yes * (current_entropy[row] - yes_entropy[offset:offset + len(candidates)])
+        choices.append(bundle.symptom_index.phrases[candidates[gain.argmax()]]) # ties keep severity order
+        offset += len(candidates)
+    return choices
+
+
+def result_cache_key(state):
+    """
+    Canonical form of everything that affects a response: symptom/severity pairs, the denied set,
+    whether question_counter is zero (the only way it enters is_final), the history set and strategy.
+    """
+    return (tuple(sorted(state['collected_symptoms'].items())), tuple(sorted(set(state['denied_symptoms']))),
+            min(state['question_counter'], 1), tuple(sorted(set(state['user_medical_history']))), state['question_strategy'])
+
+
+def predict_states(states, bundle):
+    """
+    Scores a list of parsed states in a single forward pass and returns one response dict per state, in order.
+    Everything is read from one bundle, so a concurrent reload never mixes two artifact versions in a response.
+    """
+    probabilities = forward_states(states, bundle)
+    with METRICS.stage('history_boost'):
+        probabilities, all_history_matches = apply_history_boost(probabilities, states, bundle)
+
+    # Top-5 for the response and top-2 for the next question come from the same sorted slice.
+    with METRICS.stage('top_k'):
+        top_indices = np.argsort(-probabilities, axis=1, kind='stable')[:, :min(5, len(bundle.engine.classes))]
+        top_diseases = bundle.engine.classes[top_indices].tolist()
+        top_confidences = (np.take_along_axis(probabilities, top_indices, axis=1) * 100).tolist()
+        top_class_ids = top_indices[:, 0].tolist()
+    with METRICS.stage('next_question'):
+        asked = bundle.symptom_index.asked_mask(states)
+        next_symptom_tokens = bundle.symptom_index.next_questions(top_indices[:, :2], asked)
+    info_gain_rows = [row for row, state in enumerate(states)
+                      if state['question_strategy'] == 'info_gain' and not reached_confidence(top_confidences[row][0], state['question_counter'])]
+    if info_gain_rows:
+        with METRICS.stage('info_gain'):
+            choices = info_gain_questions(probabilities[info_gain_rows], top_indices[info_gain_rows],
+                                          [states[row] for row in info_gain_rows], asked[info_gain_rows], bundle)
+        for row, choice in zip(info_gain_rows, choices):
+            if choice: next_symptom_tokens[row] = choice
+
+    results = []
+    with METRICS.stage('build_response'):
+        for row, state in enumerate(states):
+            decoded_predictions = [{'disease': disease, 'confidence': confidence} for disease, confidence in zip(top_diseases[row], top_confidences[row])]
+            top_confidence = decoded_predictions[0]['confidence']
+            history_matches, question_counter = all_history_matches[row], state['question_counter']
+            medical_history_note = None
+            top_condition_id = bundle.history_index.class_condition[top_class_ids[row]]
+            if history_matches and top_condition_id >= 0:
+                condition = bundle.history_index.conditions[top_condition_id]
+                if condition in history_matches:
+                    medical_history_note = f"Note: Symptoms show a {(history_matches[condition]*100):.0f}% overlap with your pre-existing condition: '{condition}'."
+
+            is_final = reached_confidence(top_confidence, question_counter)
+            next_question = None
+            if not is_final:
+                next_symptom_token = next_symptom_tokens[row]
+                if next_symptom_token:
+                    next_question = {"token": next_symptom_token, "text": f"Are you experiencing '{next_symptom_token.replace('_', ' ')}'?"}
+                else: is_final = True
+
+            results.append({'predictions': decoded_predictions, 'is_final': is_final, 'next_question': next_question, 'medical_history_note': medical_history_note})
+    return results
+
+
+# --- Offline Tools ---
+def worker_pool(workers, initializer=None, initargs=()):
+    """Process pool for the offline tools. Forked workers inherit the loaded artifacts and module state instead of rebuilding them."""
+    context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+    return context.Pool(workers, initializer, initargs)